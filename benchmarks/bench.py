@@ -0,0 +1,262 @@
+#! /usr/bin/python3
+'''
+Benchmarks of the parse -> sort -> clip -> serialize pipeline of xy-data-plot.
+
+  python3 benchmarks/bench.py --profile quick --output results.json
+  python3 benchmarks/bench.py --profile quick --baseline results.json --tolerance 0.3
+
+The startup time (import of the core module and of the extension) is measured in
+fresh interpreters. Synthetic CSV-files are generated into a temporary directory. Every stage is timed
+(best of --repeat runs) and measured once more with tracemalloc for its peak memory.
+With --baseline the results are compared to an earlier run and the exit code is 1
+if a stage got slower or needs more memory than the tolerance allows.
+'''
+
+import argparse
+import importlib.util
+import io
+import json
+import math
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+ROOT = os.path.dirname(HERE)
+sys.path.insert(0, ROOT)
+
+import xy_data_plot_core as core
+
+# rows, y-columns, order of x, fraction of points outside of the plot, fraction of malformed rows
+PROFILES = {
+  'quick': [
+    (1000,    1,   'sorted', 0.0, 0.0),
+    (10000,   1,   'random', 0.0, 0.0),
+    (100000,  1,   'random', 0.0, 0.0),
+    (100000,  1,   'sorted', 0.8, 0.0),
+    (100000,  1,   'random', 0.0, 0.01),
+    (10000,   20,  'random', 0.0, 0.0),
+  ],
+  'full': [
+    (1000,     1,   'sorted', 0.0, 0.0),
+    (100000,   1,   'random', 0.0, 0.0),
+    (1000000,  1,   'random', 0.0, 0.0),
+    (1000000,  1,   'sorted', 0.8, 0.0),
+    (1000000,  1,   'random', 0.0, 0.01),
+    (10000000, 1,   'sorted', 0.0, 0.0),
+    (1000000,  10,  'random', 0.0, 0.0),
+    (100000,   200, 'random', 0.0, 0.0),
+  ],
+}
+
+def loadExtension():
+  "Imports xy-data-plot.py (and inkex), the file name is not a valid module name."
+
+  spec = importlib.util.spec_from_file_location('xy_data_plot', os.path.join(ROOT, 'xy-data-plot.py'))
+  module = importlib.util.module_from_spec(spec)
+  spec.loader.exec_module(module)
+  return module
+
+def caseName(rows, ycols, order, clip, malformed):
+  return 'rows{}-y{}-{}-clip{}-bad{}'.format(rows, ycols, order, clip, malformed)
+
+def writeCSV(filename, rows, ycols, order, malformed, seed=1):
+  """Writes a CSV-file with a header, x = 0..rows-1 (sorted or shuffled) and ycols columns of
+  noisy sine waves between 0 and 1. A fraction malformed of the rows is broken."""
+
+  rnd = random.Random(seed)
+  xs = list(range(rows))
+  if order == 'random':
+    rnd.shuffle(xs)
+  with open(filename, 'w', encoding='utf-8', newline='') as f:
+    f.write(';'.join(['x'] + ['y{}'.format(j) for j in range(ycols)]) + '\n')
+    lines = []
+    for x in xs:
+      r = rnd.random()
+      if r < malformed/2:
+        lines.append('{};not a number\n'.format(x))
+      elif r < malformed:
+        lines.append('{}\n'.format(x))
+      else:
+        ys = [0.5+0.45*math.sin(x/997+j)+0.05*(rnd.random()-0.5) for j in range(ycols)]
+        lines.append(';'.join([str(x)] + ['{:.6f}'.format(y) for y in ys]) + '\n')
+      if len(lines) >= 10000:
+        f.writelines(lines)
+        lines = []
+    f.writelines(lines)
+
+class Stages:
+  "Runs the stages of a pipeline one after another and records time or peak memory of every stage."
+
+  def __init__(self, memory=False):
+    self.memory = memory
+    self.results = {}
+
+  def run(self, name, function, *args):
+    if self.memory:
+      tracemalloc.start()
+      try:
+        result = function(*args)
+        self.results[name] = tracemalloc.get_traced_memory()[1]
+      finally:
+        tracemalloc.stop()
+    else:
+      start = time.perf_counter()
+      result = function(*args)
+      self.results[name] = time.perf_counter()-start
+    return result
+
+def runPipeline(xdp, filename, ycols, clip, memory=False):
+  "One pass over getCSVData, sort, calculateMinMax, plotPath, the Axis builders and serialization."
+
+  from inkex import Group, Style, Vector2d, BoundingBox
+  stages = Stages(memory)
+  yidxs = list(range(1, ycols+1))
+  data = stages.run('getCSVData', core.getCSVData, filename, 'utf-8', {'delimiter': ';'}, 1, 0, yidxs)
+  stages.run('sort', data.sort)
+  stages.run('calculateMinMax', data.calculateMinMax)
+
+  plot = xdp.XY_Data_Plot()
+  plot.options = plot.arg_parser.parse_args([])
+  plot.data = data
+  plot.bb = BoundingBox((0, 500), (0, 300))
+  plot.pathwriter = core.PathWriter(plot.options.path_precision, plot.options.path_relative)
+  plot.xscale = plot.yscale = core.LinearScale()
+  (plot.xmin, plot.xmax) = (data.getXMin(), data.getXMax())
+  # the data is between 0 and 1, clip is the fraction of the y-range outside of the plot
+  (plot.ymin, plot.ymax) = (clip/2, 1-clip/2) if clip else (data.getYMin(), data.getYMax())
+  plot.scaleRanges()
+  style = Style({'stroke': '#000000', 'fill': 'none'})
+  paths = stages.run('plotPath', lambda: [plot.plotPath(style, i) for i in range(ycols)])
+
+  xaxis = xdp.Axis(Vector2d(0, 300), Vector2d(500, 300), plot.xmin, plot.xmax)
+  def axis(merged):
+    group = Group()
+    group.add(xaxis.getTicks(100, -8, 0, style, merged))
+    group.add(xaxis.getSubTicks(100, 9, -4, 0, style, merged))
+    group.add(xaxis.getNumbers(100, '.2f', 24, 0, style))
+    return group
+  stages.run('Axis', axis, True)
+  ticks = stages.run('Axis (lines)', axis, False)
+
+  group = Group()
+  group.add(ticks, *paths)
+  stages.run('serialize', group.tostring)
+  return stages.results
+
+def runEffect(xdp, memory=False):
+  "The complete XY_Data_Plot.effect with example.csv on example.svg with an added rectangle."
+
+  with open(os.path.join(ROOT, 'example.svg'), encoding='utf-8') as f:
+    svg = f.read()
+  rect = '<rect id="benchrect" x="70" y="30" width="100" height="70" style="fill:none;stroke:#000000" />'
+  svg = svg.replace('</svg>', rect+'\n</svg>')
+  with tempfile.TemporaryDirectory() as tmp:
+    template = os.path.join(tmp, 'template.svg')
+    with open(template, 'w', encoding='utf-8') as f:
+      f.write(svg)
+    args = ['--id=benchrect', '--csv_file='+os.path.join(ROOT, 'example.csv'), '--csv_columny=1;2;3',
+            '--csv_ignorefirst=1', '--csv_cache=false', '--xaxis_grid=true', '--yaxis_grid=true', template]
+    stages = Stages(memory)
+    stages.run('effect', xdp.XY_Data_Plot().run, args, io.BytesIO())
+  return stages.results
+
+def startupTime(statement, repeat):
+  "Best wall time of a fresh interpreter running statement, minus the time of an empty one."
+
+  def best(code):
+    times = []
+    for i in range(repeat):
+      start = time.perf_counter()
+      subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True)
+      times.append(time.perf_counter()-start)
+    return min(times)
+  return max(0.0, best(statement)-best('pass'))
+
+def measureStartup(repeat):
+  "Import time of the core module alone and of the complete extension with inkex."
+
+  results = {'import core': {'seconds': startupTime('import xy_data_plot_core', repeat), 'peak_bytes': None}}
+  load = ('import importlib.util; spec = importlib.util.spec_from_file_location("xdp", "xy-data-plot.py"); '
+          'spec.loader.exec_module(importlib.util.module_from_spec(spec))')
+  try:
+    results['import extension'] = {'seconds': startupTime(load, repeat), 'peak_bytes': None}
+  except subprocess.CalledProcessError:
+    print('import of the extension failed, is inkex installed?', file=sys.stderr)
+  return results
+
+def measure(xdp, cases, workdir, repeat, memory):
+  results = {'startup': measureStartup(max(repeat, 5))}
+  for (rows, ycols, order, clip, malformed) in cases:
+    name = caseName(rows, ycols, order, clip, malformed)
+    filename = os.path.join(workdir, name+'.csv')
+    writeCSV(filename, rows, ycols, order, malformed)
+    runs = [runPipeline(xdp, filename, ycols, clip) for i in range(repeat)]
+    peaks = runPipeline(xdp, filename, ycols, clip, memory=True) if memory else {}
+    results[name] = {stage: {'seconds': min(run[stage] for run in runs), 'peak_bytes': peaks.get(stage)}
+                     for stage in runs[0]}
+    os.remove(filename)
+    print('{:<40} {}'.format(name, '  '.join('{} {:.4f}s'.format(stage, value['seconds'])
+                                              for (stage, value) in results[name].items())), file=sys.stderr)
+  runs = [runEffect(xdp) for i in range(repeat)]
+  peaks = runEffect(xdp, memory=True) if memory else {}
+  results['example.svg'] = {'effect': {'seconds': min(run['effect'] for run in runs), 'peak_bytes': peaks.get('effect')}}
+  return results
+
+def compare(results, baseline, tolerance, minseconds):
+  "Returns the list of regressions of results against baseline."
+
+  regressions = []
+  for (case, stages) in results.items():
+    for (stage, value) in stages.items():
+      old = baseline.get(case, {}).get(stage)
+      if old is None:
+        continue
+      if value['seconds'] > old['seconds']*(1+tolerance) and value['seconds']-old['seconds'] > minseconds:
+        regressions.append('{} {}: {:.4f}s, baseline {:.4f}s'.format(case, stage, value['seconds'], old['seconds']))
+      if value['peak_bytes'] and old.get('peak_bytes') and value['peak_bytes'] > old['peak_bytes']*(1+tolerance):
+        regressions.append('{} {}: {} bytes, baseline {} bytes'.format(case, stage, value['peak_bytes'], old['peak_bytes']))
+  return regressions
+
+def main(argv=None):
+  parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+  parser.add_argument('--profile', choices=sorted(PROFILES), default='quick')
+  parser.add_argument('--repeat', type=int, default=3, help='timing runs per case, the best one counts')
+  parser.add_argument('--no-memory', dest='memory', action='store_false', help='skip the tracemalloc run')
+  parser.add_argument('--output', default='-', help='JSON-file for the results, -: stdout')
+  parser.add_argument('--baseline', help='JSON-file of an earlier run to compare with')
+  parser.add_argument('--tolerance', type=float, default=0.25, help='allowed relative slowdown/memory growth')
+  parser.add_argument('--min-seconds', type=float, default=0.005, help='smaller slowdowns are ignored as noise')
+  options = parser.parse_args(argv)
+
+  xdp = loadExtension()
+  with tempfile.TemporaryDirectory() as workdir:
+    results = measure(xdp, PROFILES[options.profile], workdir, options.repeat, options.memory)
+  report = {
+    'profile': options.profile,
+    'python': platform.python_version(),
+    'numpy': getattr(core.np, '__version__', None),
+    'results': results,
+  }
+  if options.output == '-':
+    print(json.dumps(report, indent=2))
+  else:
+    with open(options.output, 'w', encoding='utf-8') as f:
+      json.dump(report, f, indent=2)
+
+  if options.baseline:
+    with open(options.baseline, encoding='utf-8') as f:
+      baseline = json.load(f)['results']
+    regressions = compare(results, baseline, options.tolerance, options.min_seconds)
+    for regression in regressions:
+      print('REGRESSION', regression, file=sys.stderr)
+    return 1 if regressions else 0
+  return 0
+
+if __name__ == '__main__':
+  sys.exit(main())
@@ -0,0 +1,108 @@
+'''
+Streaming mode of xy-data-plot: the two passes over a data file (StreamRanges, streamPaths)
+with every decimation method and with linear and log axes, with and without NumPy installed.
+
+  python3 -m pytest tests
+'''
+
+import math
+import os
+import sys
+from array import array
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import xy_data_plot_core as core
+
+ROWS = 3000
+METHODS = ('none', 'minmax', 'lttb')
+SCALES = (('linear', 'linear'), ('log', 'log'), ('linear', 'log'), ('log', 'linear'), ('symlog', 'symlog'))
+
+@pytest.fixture
+def csvfile(tmp_path):
+  "A CSV-file sorted by x with a header, two y-columns and some values not defined on a log-axis."
+
+  path = tmp_path / 'data.csv'
+  with open(path, 'w') as f:
+    f.write('x,a,b\n')
+    for i in range(ROWS):
+      x = 1+i/10
+      f.write('{},{},{}\n'.format(x, math.sin(x)*100, -5 if i % 97 == 0 else x*x))
+  return str(path)
+
+@pytest.fixture
+def rawfile(tmp_path):
+  "The same kind of data as raw float64 values with three columns."
+
+  path = tmp_path / 'data.f64'
+  values = array('d')
+  for i in range(ROWS):
+    x = 1+i/10
+    values.extend((x, math.sin(x)*100, -5 if i % 97 == 0 else x*x))
+  with open(path, 'wb') as f:
+    values.tofile(f)
+  return str(path)
+
+def blocks(path):
+  return core.iterDataBlocks(path, 'utf-8', {'delimiter': ','}, 1, 0, [1, 2], rawcolumns=3)
+
+def streamPlot(path, method, scales):
+  """Both passes of the streaming mode. Returns the path data of the two series and the path data
+  of the same series read at once."""
+
+  (xscale, yscale) = (core.makeScale(scales[0]), core.makeScale(scales[1]))
+  ranges = core.StreamRanges(2, 'log' in scales)
+  for (x, ycols) in blocks(path):
+    ranges.add(x, ycols)
+  ranges.calculateMinMax()
+  (xmin, xmax) = (ranges.xmin, ranges.xmax)
+  (ymin, ymax) = (min(ranges.ymin), max(ranges.ymax))
+  if xscale.name == 'log':
+    (xmin, xmax) = ranges.positive[0]
+  if yscale.name == 'log':
+    ymin = min(lo for (lo, hi) in ranges.positive[1:])
+  plotranges = (xscale.forward(xmin), xscale.forward(xmax), yscale.forward(ymin), yscale.forward(ymax))
+  seriespaths = core.SeriesPaths(xscale, yscale, plotranges, (0, 0, 400, 300), core.PathWriter(),
+                                 method, 200, ranges.rows)
+  streamed = core.streamPaths(blocks(path), seriespaths, 2)
+  data = core.getCSVData(path, 'utf-8', {'delimiter': ','}, 1, 0, [1, 2], rawcolumns=3)
+  assert data.len() == ranges.rows
+  return (streamed, [seriespaths.pathData(*data.getSeries(i)) for i in range(2)])
+
+@pytest.mark.parametrize('scales', SCALES)
+@pytest.mark.parametrize('method', METHODS)
+def test_stream_csv(csvfile, method, scales):
+  check(*streamPlot(csvfile, method, scales), method)
+
+@pytest.mark.parametrize('scales', SCALES)
+@pytest.mark.parametrize('method', METHODS)
+def test_stream_raw_blocks(rawfile, method, scales, monkeypatch):
+  monkeypatch.setattr(core, 'STREAM_BLOCKROWS', 333)
+  assert len(list(blocks(rawfile))) == (ROWS+332)//333
+  check(*streamPlot(rawfile, method, scales), method)
+
+def check(streamed, expected, method):
+  """Without decimation the blocks continue each other's paths exactly, only the blanks between
+  the commands may differ. A decimated series keeps a share of the budget per block, its points
+  depend on the blocks."""
+
+  for (path, full) in zip(streamed, expected):
+    if method == 'none':
+      assert path.split() == full.split()
+    else:
+      assert path.lstrip().startswith('M')
+
+@pytest.mark.parametrize('method', METHODS)
+def test_stream_single_block_equals_plot(csvfile, method):
+  "A file read in one block gives the same path data as the series read at once."
+
+  data = core.getCSVData(csvfile, 'utf-8', {'delimiter': ','}, 1, 0, [1, 2])
+  xscale = yscale = core.makeScale('linear')
+  data.calculateMinMax()
+  plotranges = (data.xmin, data.xmax, min(data.ymin), max(data.ymax))
+  seriespaths = core.SeriesPaths(xscale, yscale, plotranges, (0, 0, 400, 300), core.PathWriter(),
+                                 method, 200, data.len())
+  expected = [seriespaths.pathData(*data.getSeries(i)) for i in range(2)]
+  assert core.streamPaths(blocks(csvfile), seriespaths, 2) == expected
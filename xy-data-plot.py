@@ -23,41 +23,24 @@ Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
 '''
 
 from inkex import TextElement, Effect, Line, PathElement, Style, Vector2d
-from inkex import Group, Rectangle, Boolean as Bool, errormsg, AbortExtension
+from inkex import Group, Rectangle, Boolean as Bool, errormsg, AbortExtension, BoundingBox, Image
+from array import array
+import json
 import math
+import os
 import re
+import sys
 
-def getCSVData(csvfile,fileencoding,csvoptions,ignorefirst,xidx,yidxarr):
-  import csv
-  data = XYValues(len(yidxarr))
-  with open(csvfile, newline='', encoding=fileencoding ) as f:
-    reader = csv.reader(f,**csvoptions)
-    try:
-      for row in reader:
-        if reader.line_num <= ignorefirst:
-            continue
-        try:
-          data.append( float(row[xidx]), [ float(row[yidx]) for yidx in yidxarr ] )
-        except ValueError as e:
-          errormsg(_("Float error: line {}: {}".format(reader.line_num, row)))
-        except IndexError:
-          errormsg(_("Not enough fields in line {}: {}".format(reader.line_num, row)))
-    except csv.Error as e:
-      errormsg(_("Error on importing CSV: {}\n{}\n{}".format(csvfile, reader.line_num, e)))
-  return data
-
-# Helper function for getting proper min-max-values
-def ceil( n, decimals = None ):
-  if not decimals:
-    decimals = 1 if n == 0 else int( math.log10(abs(n)) )
-  multiplier = 10 ** decimals
-  return math.ceil(n / multiplier) * multiplier
-
-def floor( n, decimals = None ):
-  if not decimals:
-    decimals = 1 if n == 0 else int( math.log10(abs(n)) )
-  multiplier = 10 ** decimals
-  return math.floor(n / multiplier) * multiplier
+from xy_data_plot_core import np, getCSVData, parseSource, readCSVRange, iterDataBlocks, detectFormat, BINARY_FORMATS, CSVReport, CSVCache, StageProfiler
+from xy_data_plot_core import XYSources, parseSeries, roundRange, LinearScale, makeScale
+from xy_data_plot_core import PathWriter, SeriesPaths, StreamRanges, streamPaths
+from xy_data_plot_core import densityCounts, densityPixels, encodePNG, DENSITY_MAXPX
+
+STATE_ATTRIBUTE = 'data-xyplot-state'   # resume information of an incremental plot
+SERIES_ATTRIBUTE = 'data-xyplot-series' # index of the series of a plot path
+PROFILE_ATTRIBUTE = 'data-xyplot-profile'  # stage times and counters of the last run
+STATE_IGNORE = ('tab', 'input_file', 'output', 'ids', 'selected_nodes', 'remove',
+                'profile', 'profile_output', 'profile_store', 'profile_dump', 'path_workers')
 
 def textAt( x, y, text, style, rotate=0 ):
   "Places a test-element at global-coordinates."
@@ -69,102 +52,65 @@ def textAt( x, y, text, style, rotate=0 ):
     elem.set('transform','rotate({},{},{})'.format(rotate,x,y))
   return elem
 
-def intersectionParameter(s0,s1,smax):
-  if s1 == s0:
-    return math.inf
-  return (smax-s0)/(s1-s0)
-
-def intersectionPoint(values,prevalues,xmin,xmax,ymin,ymax):
-  sxmin = intersectionParameter(prevalues['x'],values['x'],xmin)
-  sxmax = intersectionParameter(prevalues['x'],values['x'],xmax)
-  symin = intersectionParameter(prevalues['y'],values['y'],ymin)
-  symax = intersectionParameter(prevalues['y'],values['y'],ymax)
-  s = 1
-  if sxmin >= 0 and sxmin < 1 and sxmin < s:
-    s = sxmin
-  if sxmax >= 0 and sxmax < 1 and sxmax < s:
-    s = sxmax
-  if symin >= 0 and symin < 1 and symin < s:
-    s = symin
-  if symax >= 0 and symax < 1 and symax < s:
-    s = symax
-  return {'x': prevalues['x']+s*(values['x']-prevalues['x']), 'y': prevalues['y']+s*(values['y']-prevalues['y'])}
-
-class XYValues:
-  def __init__(self, numberOfYColumns=1 ):
-    self.nYCols = numberOfYColumns
-    self.data = []
-    self.xmin = None
-    self.xmax = None
-    self.ymin = [None for i in range(numberOfYColumns)]
-    self.ymax = [None for i in range(numberOfYColumns)]
-  
-  def __iter__(self):
-    return iter(self.data)
-  
-  def append(self, x, yarr):
-    self.data.append({'x':x,'y':yarr})
-  
-  def len(self):
-    return len(self.data)
-  
-  def sort(self):
-    self.data.sort(key=lambda tup: tup['x'])
-  
-  def getXMin(self):
-    return self.xmin
-  
-  def getXMax(self):
-    return self.xmax
-  
-  def getYMin(self):
-    return min(self.ymin)
-  
-  def getYMax(self):
-    return max(self.ymax)
-  
-  def calculateMinMax(self):
-    (self.xmin,self.xmax) = self._calculateMinMaxFromArray([val['x'] for val in self.data])
-    for i in range(self.nYCols):
-      (self.ymin[i],self.ymax[i]) = self._calculateMinMaxFromArray([val['y'][i] for val in self.data])
-  
-  def _calculateMinMaxFromArray(self,array,round=True):
-    vmin = min(array)
-    vmax = max(array)
-    
-    if round:
-      vmax = ceil(vmax)
-      vmin = floor(vmin, decimals = 1 if vmax == 0 else int( math.log10(abs(vmax)) ) )
-    return (vmin, vmax)
-
 class Axis:
-  def __init__(self, von: Vector2d, bis: Vector2d, min: float, max: float ):
-    "We need two svg-points and the min- and max-value of the axis."
+  def __init__(self, von: Vector2d, bis: Vector2d, min: float, max: float, scale=None ):
+    "We need two svg-points and the min- and max-value of the axis, scale is linear by default."
     self.von = von
     self.bis = bis
     self.min = min
     self.max = max
+    self.scale = scale or LinearScale()
+    self.smin = self.scale.forward(min)
+    self.smax = self.scale.forward(max)
     self.winkel = math.atan2(bis.y-von.y,bis.x-von.x)
     self.cos = math.cos(self.winkel)
     self.sin = math.sin(self.winkel)
+    self.ticks = {}
     if min == max:
       raise ValueError('min == max')
   
   def transform(self, val: float):
     "Transform scalar value of axis to svg xy-coordinates"
     
-    return self.von+(val-self.min)/(self.max-self.min)*(self.bis-self.von)
+    return self.von+(self.scale.forward(val)-self.smin)/(self.smax-self.smin)*(self.bis-self.von)
   
-  def getTicks( self, ticks: int, linevon: float, linebis: float, style: Style):
-    "The main ticks, linevon and linebis are the start- and end-point perpendicular to the axis in svg-coordinates."
+  def tickValues(self, ticks: int):
+    "The values of the main ticks, computed once per axis and count."
     
-    group = Group()
-    if ticks <= 0:
-      return group
+    if ticks not in self.ticks:
+      step = (self.smax-self.smin) / ticks
+      self.ticks[ticks] = [self.scale.inverse(self.smin + i * step) for i in range(ticks+1)]
+    return self.ticks[ticks]
+  
+  def subTickValues(self, ticks: int, subticks: int):
+    "The values between the main ticks, equally spaced in data values (e.g. 2..9 in a decade)."
+    
+    if (ticks, subticks) not in self.ticks:
+      values = self.tickValues(ticks)
+      if self.scale.name == 'linear':
+        step = (self.max-self.min) / ticks
+        steps = [step]*ticks
+      else:
+        steps = [b-a for (a, b) in zip(values, values[1:])]
+      self.ticks[(ticks, subticks)] = [val + j * step / (subticks+1) for (val, step) in zip(values, steps) for j in range(1,subticks+1)]
+    return self.ticks[(ticks, subticks)]
+  
+  def getLines( self, values, linevon: float, linebis: float, style: Style, merged: bool = False ):
+    """Lines perpendicular to the axis at the given values. merged: one path-element with a subpath
+    for every line, otherwise a group of line-elements."""
+    
+    if merged:
+      segments = []
+      for val in values:
+        point = self.transform(val)
+        segments.append('M{},{} L{},{}'.format(point.x-linevon*self.sin, point.y+linevon*self.cos,
+                                               point.x-linebis*self.sin, point.y+linebis*self.cos))
+      path = PathElement(d=' '.join(segments))
+      path.style = style
+      return path
     
-    step = (self.max-self.min) / ticks
-    for i in range(ticks+1):
-      val = self.min + i * step
+    group = Group()
+    for val in values:
       point = self.transform(val)
       line = Line(
         x1=str(point.x-linevon*self.sin),
@@ -175,29 +121,20 @@ class Axis:
       line.style = style
       group.add(line)
     return group
+  
+  def getTicks( self, ticks: int, linevon: float, linebis: float, style: Style, merged: bool = False ):
+    "The main ticks, linevon and linebis are the start- and end-point perpendicular to the axis in svg-coordinates."
+    
+    if ticks <= 0:
+      return Group()
+    return self.getLines(self.tickValues(ticks), linevon, linebis, style, merged)
 
-  def getSubTicks( self, ticks: int, subticks: int, linevon: float, linebis: float, style: Style):
+  def getSubTicks( self, ticks: int, subticks: int, linevon: float, linebis: float, style: Style, merged: bool = False ):
     "Only the ticks between the main ticks, linevon and linebis are the start- and end-point perpendicular to the axis in svg-coordinates."
     
-    group = Group()
     if ticks <= 0 or subticks <= 0:
-      return group
-    
-    step = (self.max-self.min) / ticks
-    for i in range(ticks):
-      val = self.min + i * step
-      for j in range(1,subticks+1):
-        subval = val + j * step / (subticks+1)
-        point = self.transform(subval)
-        line = Line(
-          x1=str(point.x-linevon*self.sin),
-          y1=str(point.y+linevon*self.cos),
-          x2=str(point.x-linebis*self.sin),
-          y2=str(point.y+linebis*self.cos)
-        )
-        line.style = style
-        group.add(line)
-    return group
+      return Group()
+    return self.getLines(self.subTickValues(ticks, subticks), linevon, linebis, style, merged)
     
   def getNumbers( self, ticks: int, fmtstr: str, intan: float, inrad: float, style: Style ):
     "The numbers at the main-ticks. intan: shift perpendicular to axis, inrad: shift in axis."
@@ -206,9 +143,7 @@ class Axis:
     if ticks <= 0:
       return group
     
-    step = (self.max-self.min) / ticks
-    for i in range(ticks+1):
-      val = self.min + i * step
+    for val in self.tickValues(ticks):
       point = self.transform(val)
       group.add( textAt( point.x-intan*self.sin+inrad*self.cos, point.y+intan*self.cos+inrad*self.sin, "{0:{1}}".format(val,fmtstr), style) )
     return group
@@ -224,8 +159,17 @@ class XY_Data_Plot(Effect):
     self.arg_parser.add_argument("--csv_columnx",     dest="xidx",          action="store", type=int,  default=0)
     self.arg_parser.add_argument("--csv_columny",     dest="yidxs",         action="store", type=str,  default="1")
     self.arg_parser.add_argument("--csv_ignorefirst", dest="ignorefirst",   action="store", type=int,  default=0)
+    self.arg_parser.add_argument("--csv_decimalcomma",dest="decimalcomma",  action="store", type=Bool, default="false")
     self.arg_parser.add_argument("--csv_storedata",   dest="storedata",     action="store", type=Bool, default="false")
-    
+    self.arg_parser.add_argument("--csv_series",      dest="series",        action="store", type=str,  default="")
+    self.arg_parser.add_argument("--csv_series_workers", dest="series_workers", action="store", type=int, default=4)
+    self.arg_parser.add_argument("--csv_cache",       dest="cache",         action="store", type=Bool, default="true")
+    self.arg_parser.add_argument("--csv_cache_size",  dest="cache_size",    action="store", type=int,  default=1024)
+    self.arg_parser.add_argument("--csv_cache_dir",   dest="cache_dir",     action="store", type=str,  default="")
+    self.arg_parser.add_argument("--csv_incremental", dest="incremental",   action="store", type=Bool, default="false")
+    self.arg_parser.add_argument("--csv_raw_columns", dest="raw_columns",   action="store", type=int,  default=2)
+    self.arg_parser.add_argument("--csv_streaming",   dest="streaming",     action="store", type=Bool, default="false")
+
     self.arg_parser.add_argument("--xaxis_format"   ,  dest="xformat"   , action="store", type=str,   default="")
     self.arg_parser.add_argument("--xaxis_min"      ,  dest="xmin"      , action="store", type=float, default=0)
     self.arg_parser.add_argument("--xaxis_max"      ,  dest="xmax"      , action="store", type=float, default=100)
@@ -236,6 +180,8 @@ class XY_Data_Plot(Effect):
     self.arg_parser.add_argument("--xaxis_ticksin"  ,  dest="xticksin"  , action="store", type=Bool, default="true")
     self.arg_parser.add_argument("--xaxis_ticksout" ,  dest="xticksout" , action="store", type=Bool, default="false")
     self.arg_parser.add_argument("--xaxis_grid"     ,  dest="xgrid"     , action="store", type=Bool, default="false")
+    self.arg_parser.add_argument("--xaxis_scale"    ,  dest="xscale"    , action="store", type=str,   default="linear")
+    self.arg_parser.add_argument("--xaxis_linthresh",  dest="xlinthresh", action="store", type=float, default=1)
     
     self.arg_parser.add_argument("--yaxis_format"   ,  dest="yformat"   , action="store", type=str,   default="")
     self.arg_parser.add_argument("--yaxis_min"      ,  dest="ymin"      , action="store", type=float, default=0)
@@ -247,6 +193,8 @@ class XY_Data_Plot(Effect):
     self.arg_parser.add_argument("--yaxis_ticksin"  ,  dest="yticksin"  , action="store", type=Bool, default="true")
     self.arg_parser.add_argument("--yaxis_ticksout" ,  dest="yticksout" , action="store", type=Bool, default="false")
     self.arg_parser.add_argument("--yaxis_grid"     ,  dest="ygrid"     , action="store", type=Bool, default="false")
+    self.arg_parser.add_argument("--yaxis_scale"    ,  dest="yscale"    , action="store", type=str,   default="linear")
+    self.arg_parser.add_argument("--yaxis_linthresh",  dest="ylinthresh", action="store", type=float, default=1)
 
     self.arg_parser.add_argument("--border_create_left"  , dest="border_left"  , action="store", type=Bool, default="true")
     self.arg_parser.add_argument("--border_create_bottom", dest="border_bottom", action="store", type=Bool, default="true")
@@ -258,58 +206,357 @@ class XY_Data_Plot(Effect):
     self.arg_parser.add_argument("--label_yaxis", dest="label_yaxis", type=str, action="store", default="")
     self.arg_parser.add_argument("--font_family", dest="font_family", type=str, action="store", default="sans")
     
+    self.arg_parser.add_argument("--decimate"    , dest="decimate"    , type=str  , action="store", default="none")
+    self.arg_parser.add_argument("--decimate_ppx", dest="decimate_ppx", type=float, action="store", default=4)
+    self.arg_parser.add_argument("--path_precision", dest="path_precision", type=int  , action="store", default=-1)
+    self.arg_parser.add_argument("--path_relative" , dest="path_relative" , type=Bool , action="store", default="false")
+    self.arg_parser.add_argument("--path_simplify" , dest="path_simplify" , type=float, action="store", default=0)
+    self.arg_parser.add_argument("--path_report"   , dest="path_report"   , type=Bool , action="store", default="false")
+    self.arg_parser.add_argument("--path_workers"  , dest="path_workers"  , type=int  , action="store", default=1)
+    self.arg_parser.add_argument("--merge_lines"   , dest="merge_lines"   , type=Bool , action="store", default="true")
+    self.arg_parser.add_argument("--render"         , dest="render"        , type=str  , action="store", default="path")
+    self.arg_parser.add_argument("--density_dpi"    , dest="density_dpi"   , type=float, action="store", default=96)
+    self.arg_parser.add_argument("--density_colormap", dest="density_colormap", type=str, action="store", default="viridis")
+    self.arg_parser.add_argument("--density_log"    , dest="density_log"   , type=Bool , action="store", default="true")
+    
+    self.arg_parser.add_argument("--profile"       , dest="profile"       , type=Bool , action="store", default="false")
+    self.arg_parser.add_argument("--profile_output", dest="profile_output", type=str  , action="store", default="")
+    self.arg_parser.add_argument("--profile_store" , dest="profile_store" , type=Bool , action="store", default="false")
+    self.arg_parser.add_argument("--profile_dump"  , dest="profile_dump"  , type=str  , action="store", default="")
+    
     self.arg_parser.add_argument("--stroke_width"     , dest="stroke_width"     , type=float, action="store", default="1")
     self.arg_parser.add_argument("--stroke_width_unit", dest="stroke_width_unit", type=str  , action="store", default="px")
     self.arg_parser.add_argument("--shape_remove_old" , dest="remove", action="store", type=Bool, default="false")
 
-  def transformx(self,x):
-    "Transforms x-data-values in svg x-coordinates."
+  def parseOptions(self, binary=True):
+    """The keyword arguments of the readers of xy_data_plot_core taken from the options, they are
+    part of the cache key too. binary=False leaves out rawcolumns for readCSVRange (CSV only)."""
+    
+    options = { 'fileencoding': self.options.csv_encoding,
+                'csvoptions': { 'delimiter': self.options.csv_delimiter.replace('\\t', '\t') },
+                'ignorefirst': self.options.ignorefirst,
+                'decimalcomma': self.options.decimalcomma }
+    if binary:
+      options['rawcolumns'] = self.options.raw_columns
+    return options
+
+  def readData(self, yidxarray, csvfile=None, xidx=None):
+    """Reads and sorts the CSV-file (default: the csv_file and xidx options), a warm run takes the
+    columns from the cache without parsing. Binary files are memory-mapped and not cached."""
+    
+    if csvfile is None:
+      (csvfile, xidx) = (self.options.csv_file, self.options.xidx)
+
+    report = CSVReport()
+    if self.options.incremental:
+      with self.profiler.stage('read CSV'):
+        (data, end, lines) = readCSVRange(csvfile, xidx=xidx, yidxarr=yidxarray, report=report,
+                                          **self.parseOptions(binary=False))
+      self.countRows(report)
+      self.resume = (end, lines)
+      with self.profiler.stage('sort'):
+        data.sort()
+      return data
+
+    (cache, key, data) = self.cachedData(csvfile, xidx, yidxarray)
+    if data is not None:
+      return data
+
+    with self.profiler.stage('read CSV'):
+      try:
+        data = getCSVData(csvfile, xidx=xidx, yidxarr=yidxarray, report=report, **self.parseOptions())
+      except ValueError as e:
+        raise AbortExtension(str(e))
+    self.countRows(report)
+    with self.profiler.stage('sort'):
+      data.sort()
+    self.storeData(cache, key, data)
+    return data
+
+  def cachedData(self, csvfile, xidx, yidxarray):
+    """Returns (cache, key, data), data is the cached XYValues or None. cache is None if the cache is
+    not used: switched off, a binary file (memory-mapped anyway) or a missing file."""
+    
+    try:
+      binary = detectFormat(csvfile) in BINARY_FORMATS
+    except OSError:
+      binary = False # let getCSVData report the missing file
+    if not self.options.cache or binary:
+      return (None, None, None)
+    cache = CSVCache(self.options.cache_dir or None, self.options.cache_size << 20)
+    # the key hashes the whole file, it belongs to the time of a warm run
+    with self.profiler.stage('read cache'):
+      try:
+        key = cache.key(csvfile, xidx=xidx, yidxs=yidxarray, **self.parseOptions(binary=False))
+      except OSError:
+        return (None, None, None) # let getCSVData report the missing file
+      data = cache.load(key)
+    if data is not None:
+      self.profiler.count('cache hits')
+    return (cache, key, data)
+
+  def storeData(self, cache, key, data):
+    if cache is not None and data.len() >= 2:
+      with self.profiler.stage('write cache'):
+        cache.store(key, data)
+
+  def readSources(self, series):
+    """Reads the files of the series (file, xidx, yidx), every file and x-column once. Files that
+    are neither cached nor binary are parsed in worker processes, see parseSources. Returns
+    XYSources with the series in the given order."""
+    
+    sources = {}
+    for (csvfile, xidx, yidx) in series:
+      ycols = sources.setdefault((csvfile, xidx), [])
+      if yidx not in ycols:
+        ycols.append(yidx)
+    keys = list(sources)
+    datas = {}
+    pending = []
+    for (csvfile, xidx) in keys:
+      yidxarray = sources[(csvfile, xidx)]
+      try:
+        binary = detectFormat(csvfile) in BINARY_FORMATS
+      except OSError:
+        binary = True # readData reports the missing file
+      if binary:
+        # mapped here, a worker would have to copy the columns
+        datas[(csvfile, xidx)] = self.readData(yidxarray, csvfile, xidx)
+        continue
+      (cache, key, data) = self.cachedData(csvfile, xidx, yidxarray)
+      if data is not None:
+        datas[(csvfile, xidx)] = data
+      else:
+        pending.append(((csvfile, xidx), cache, key))
+    
+    files = [(csvfile, xidx, sources[(csvfile, xidx)]) for ((csvfile, xidx), cache, key) in pending]
+    with self.profiler.stage('read CSV'):
+      results = self.parseSources(files)
+    for (((csvfile, xidx), cache, key), (data, report)) in zip(pending, results):
+      self.countRows(report)
+      self.storeData(cache, key, data)
+      datas[(csvfile, xidx)] = data
+    
+    columns = [(keys.index((csvfile, xidx)), sources[(csvfile, xidx)].index(yidx)) for (csvfile, xidx, yidx) in series]
+    return XYSources([datas[key] for key in keys], columns)
+
+  def parseSources(self, files):
+    """Runs parseSource for every (csvfile, xidx, yidxarray), in a process pool with up to series_workers
+    processes (not more than cores): parsing holds the GIL, threads would not run in parallel. If
+    the pool fails, the files are parsed one after another."""
+    
+    cores = len(os.sched_getaffinity(0)) if hasattr(os, 'sched_getaffinity') else os.cpu_count() or 1
+    workers = max(1, min(self.options.series_workers, len(files), cores))
+    options = self.parseOptions()
+    try:
+      if workers > 1:
+        try:
+          from concurrent.futures import ProcessPoolExecutor
+          with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(parseSource, csvfile, xidx=xidx, yidxarr=yidxarray, **options)
+                       for (csvfile, xidx, yidxarray) in files]
+            return [future.result() for future in futures]
+        except (OSError, ImportError, NotImplementedError, RuntimeError) as e:
+          errormsg(_("Worker processes failed, the files are read one after another: {}").format(e))
+      return [parseSource(csvfile, xidx=xidx, yidxarr=yidxarray, **options) for (csvfile, xidx, yidxarray) in files]
+    except ValueError as e:
+      raise AbortExtension(str(e))
+
+  def dataBlocks(self, yidxarray, report=None):
+    "The blocks of the csv_file option for the streaming mode, see iterDataBlocks."
+    
+    return iterDataBlocks(self.options.csv_file, xidx=self.options.xidx, yidxarr=yidxarray, report=report,
+                          **self.parseOptions())
+
+  def scanData(self, yidxarray):
+    """Pass one of the streaming mode: reads the file block by block and keeps only the number of
+    rows and the ranges. Aborts if the x-values are not sorted."""
     
-    return (x-self.xmin)*self.bb.width/(self.xmax-self.xmin)+self.bb.left
+    ranges = StreamRanges(len(yidxarray), 'log' in (self.xscale.name, self.yscale.name))
+    report = CSVReport()
+    with self.profiler.stage('read CSV (pass 1)'):
+      try:
+        for (x, ycols) in self.dataBlocks(yidxarray, report):
+          ranges.add(x, ycols)
+      except ValueError as e:
+        raise AbortExtension(str(e))
+    self.countRows(report)
+    if report.rejected:
+      errormsg(_(report.summary()))
+    return ranges
+
+  def streamData(self, yidxarray):
+    "Pass two of the streaming mode: the path data of all series, the rows are not kept."
+    
+    seriespaths = self.seriesPaths()
+    seriespaths.rows = self.data.len()
+    with self.profiler.stage('plotPath (pass 2)'):
+      try:
+        return streamPaths(self.dataBlocks(yidxarray), seriespaths, len(yidxarray))
+      except ValueError as e:
+        raise AbortExtension(str(e))
+
+  def countRows(self, report, first=0):
+    "Counts the lines of report behind line first, where an incremental read started."
+    
+    self.profiler.count('rows read', report.lines-first)
+    self.profiler.count('rows rejected', report.rejected)
+
+  def scaleRanges(self):
+    "The plot ranges in the space of the axis scales."
+    
+    (self.sxmin, self.sxmax) = (self.xscale.forward(self.xmin), self.xscale.forward(self.xmax))
+    (self.symin, self.symax) = (self.yscale.forward(self.ymin), self.yscale.forward(self.ymax))
 
-  def transformy(self,y):
-    "Transforms y-data-values in svg y-coordinates."
+  def seriesPaths(self):
+    "The path generator for the current scales, ranges and bounding box."
     
-    return (self.ymax-y)*self.bb.height/(self.ymax-self.ymin)+self.bb.top
+    budget = 0
+    if self.options.decimate != 'none':
+      budget = int(self.bb.width / self.svg.unittouu('1px') * self.options.decimate_ppx)
+    return SeriesPaths(self.xscale, self.yscale,
+                       (self.sxmin, self.sxmax, self.symin, self.symax),
+                       (self.bb.left, self.bb.top, self.bb.width, self.bb.height),
+                       self.pathwriter, self.options.decimate, budget)
+  
+  def pathElement(self, pathstr, style):
+    newpath = PathElement(d=pathstr)
+    newpath.style = style
+    return newpath
   
   def plotPath( self, style, yidx=0 ):
     "Generates path-command-string and returns a path-element."
     
-    pathstr = ""
-    dataiter = iter(self.data)
-    vals = next(dataiter)
-    values = {'x':vals['x'],'y':vals['y'][yidx]}
+    return self.pathElement(self.seriesPaths().pathData(*self.data.getSeries(yidx)), style)
+
+  def stateOptions(self):
+    "The options an incremental plot depends on, a change of one of them needs a full rebuild."
     
-    nextmove = 'M'
-    if values['x'] > self.xmin and values['x'] < self.xmax and values['y'] > self.ymin and values['y'] < self.ymax:
-      pathstr += '{}{},{}'.format( nextmove, self.transformx(values['x']), self.transformy(values['y']) )
-      nextmove = 'L'
+    return {key: value for (key, value) in sorted(vars(self.options).items())
+            if key not in STATE_IGNORE and isinstance(value, (str, int, float, bool))}
+
+  def plotState(self):
+    "Everything needed to append new rows of the CSV-file to the plot later."
     
-    prevalues=values
-    while True:
-      try:
-        vals = next(dataiter)
-        values = {'x':vals['x'],'y':vals['y'][yidx]}
-      except StopIteration:
-        break
-      if values['x'] > self.xmin and values['x'] < self.xmax and values['y'] > self.ymin and values['y'] < self.ymax:
-        if nextmove == 'M':
-          interpoint = intersectionPoint(values,prevalues,self.xmin,self.xmax,self.ymin,self.ymax)
-          pathstr += ' {}{},{}'.format( nextmove, self.transformx(interpoint['x']), self.transformy(interpoint['y']) )
-          nextmove = 'L'
-        pathstr += ' {}{},{}'.format( nextmove, self.transformx(values['x']), self.transformy(values['y']) )
-        nextmove = 'L'
+    last = []
+    for i in range(self.data.nYCols):
+      (x, y) = (float(self.data.x[-1]), float(self.data.y[i][-1]))
+      last.append([x, y, self.xmin < x < self.xmax and self.ymin < y < self.ymax])
+    return {
+      'csv_file': os.path.abspath(self.options.csv_file),
+      'options': self.stateOptions(),
+      'offset': self.resume[0],
+      'lines': self.resume[1],
+      'bb': [self.bb.left, self.bb.right, self.bb.top, self.bb.bottom],
+      'range': [self.xmin, self.xmax, self.ymin, self.ymax],
+      'xrange': list(self.data.xrange),
+      'yranges': [list(r) for r in self.data.yranges],
+      'last': last,
+    }
+
+  def readState(self, node):
+    "The state of a plot group created in incremental mode or None."
+    
+    state = node.get(STATE_ATTRIBUTE)
+    if state is None:
+      return None
+    try:
+      return json.loads(state)
+    except ValueError:
+      return None
+
+  def appendData(self, group, state, yidxarray):
+    """Appends the rows added to the CSV-file since the last run to the series paths of group.
+    Ticks, grid and labels stay untouched. Returns False if the plot has to be rebuilt: the
+    options changed, the file was truncated, the new rows are not behind the old ones or
+    the axis ranges change."""
+    
+    if (self.options.storedata
+        or self.xscale.name != 'linear' or self.yscale.name != 'linear'
+        or state.get('csv_file') != os.path.abspath(self.options.csv_file)
+        or state.get('options') != self.stateOptions()):
+      return False
+    paths = {int(child.get(SERIES_ATTRIBUTE)): child for child in group if child.get(SERIES_ATTRIBUTE) is not None}
+    if sorted(paths) != list(range(len(yidxarray))):
+      return False
+    report = CSVReport()
+    try:
+      with self.profiler.stage('read CSV'):
+        (data, end, lines) = readCSVRange(self.options.csv_file, xidx=self.options.xidx, yidxarr=yidxarray,
+                                          start=state['offset'], lines=state['lines'], report=report,
+                                          **self.parseOptions(binary=False))
+    except OSError:
+      return False
+    self.countRows(report, state['lines'])
+    if end < state['offset']:
+      return False
+    self.resume = (end, lines)
+    if data.len() == 0:
+      state['offset'] = end
+      state['lines'] = lines
+      group.set(STATE_ATTRIBUTE, json.dumps(state))
+      return True
+    data.sort()
+    if data.x[0] < state['last'][0][0]:
+      return False
+    
+    # the new axis ranges must be the old ones
+    data.calculateMinMax()
+    xrange = (min(state['xrange'][0], data.xrange[0]), max(state['xrange'][1], data.xrange[1]))
+    yranges = [(min(old[0], new[0]), max(old[1], new[1])) for (old, new) in zip(state['yranges'], data.yranges)]
+    (xmin, xmax) = roundRange(*xrange)
+    yrounded = [roundRange(*r) for r in yranges]
+    self.xmin = xmin if self.options.xmin_autodetect else self.options.xmin
+    self.xmax = xmax if self.options.xmax_autodetect else self.options.xmax
+    self.ymin = min(r[0] for r in yrounded) if self.options.ymin_autodetect else self.options.ymin
+    self.ymax = max(r[1] for r in yrounded) if self.options.ymax_autodetect else self.options.ymax
+    if [self.xmin, self.xmax, self.ymin, self.ymax] != state['range']:
+      return False
+    self.scaleRanges()
+    
+    (left, right, top, bottom) = state['bb']
+    self.bb = BoundingBox((left, right), (top, bottom))
+    seriespaths = self.seriesPaths()
+    for i in range(len(yidxarray)):
+      (x, y) = data.getSeries(i)
+      (lastx, lasty, inside) = state['last'][i]
+      if np is not None:
+        (x, y) = (np.concatenate(([lastx], x)), np.concatenate(([lasty], y)))
       else:
-        if nextmove == 'L':
-          interpoint = intersectionPoint(values,prevalues,self.xmin,self.xmax,self.ymin,self.ymax)
-          pathstr += ' {}{},{}'.format( nextmove, self.transformx(interpoint['x']), self.transformy(interpoint['y']) )
-        nextmove = 'M'
-      prevalues = values
-      
-    newpath = PathElement(d=pathstr)
-    newpath.style = style
+        (x, y) = (array('d', [lastx]) + x, array('d', [lasty]) + y)
+      pathstr = seriespaths.pathData(x, y, continued=True)
+      if pathstr:
+        old = paths[i].get('d') or ''
+        paths[i].set('d', old+' '+pathstr if old.strip() else pathstr)
+      (lastx, lasty) = (float(x[-1]), float(y[-1]))
+      state['last'][i] = [lastx, lasty, self.xmin < lastx < self.xmax and self.ymin < lasty < self.ymax]
     
-    return newpath
+    state['offset'] = end
+    state['lines'] = lines
+    state['xrange'] = list(xrange)
+    state['yranges'] = [list(r) for r in yranges]
+    group.set(STATE_ATTRIBUTE, json.dumps(state))
+    return True
+
+  def densityImage(self):
+    "Bins all series into a raster at the chosen dpi and returns it as embedded PNG-image."
+    
+    inch = self.svg.unittouu('1in')
+    width = max(1, min(DENSITY_MAXPX, int(round(self.bb.width/inch*self.options.density_dpi))))
+    height = max(1, min(DENSITY_MAXPX, int(round(self.bb.height/inch*self.options.density_dpi))))
+    series = [self.data.getSeries(i, self.window) for i in range(self.data.nYCols)]
+    counts = densityCounts(series, self.sxmin, self.sxmax, self.symin, self.symax, width, height, self.xscale, self.yscale)
+    rows = densityPixels(counts, width, height, self.options.density_colormap, self.options.density_log)
+    image = Image()
+    image.set('x', self.bb.left)
+    image.set('y', self.bb.top)
+    image.set('width', self.bb.width)
+    image.set('height', self.bb.height)
+    image.set('preserveAspectRatio', 'none')
+    image.set('style', 'image-rendering:optimizeSpeed')
+    import base64
+    image.set('xlink:href', 'data:image/png;base64,'+base64.b64encode(encodePNG(width, height, rows)).decode('ascii'))
+    return image
 
   def createBorderLine(self,side,style):
     "Returns a border line of the given bounding box."
@@ -339,6 +586,34 @@ class XY_Data_Plot(Effect):
     return line
     
   def effect(self):
+    "Creates the plot, with --profile the stages are timed and reported."
+    
+    self.profiler = StageProfiler(self.options.profile)
+    profile = None
+    if self.options.profile_dump:
+      import cProfile   # only needed for --profile_dump, not on every start
+      profile = cProfile.Profile()
+      profile.enable()
+    try:
+      group = self.createPlot()
+    finally:
+      if profile is not None:
+        profile.disable()
+        profile.dump_stats(self.options.profile_dump)
+    
+    if self.options.profile:
+      self.profiler.count('DOM nodes', sum(1 for node in group.iter()))
+      report = json.dumps(self.profiler.report(), indent=2)
+      if self.options.profile_output:
+        with open(self.options.profile_output, 'w', encoding='utf-8') as f:
+          f.write(report)
+      else:
+        errormsg(report)
+      if self.options.profile_store:
+        group.set(PROFILE_ATTRIBUTE, json.dumps(self.profiler.report()))
+
+  def createPlot(self):
+    "Builds the plot group (or appends to it in incremental mode) and returns it."
   
     # Create some styles first
 
@@ -394,92 +669,271 @@ class XY_Data_Plot(Effect):
     except ValueError as e:
       raise AbortExtension(_("Split produces a string, that is not convertable to int."))
     
-    # get CSV data
-    self.data = getCSVData(self.options.csv_file,
-                           self.options.csv_encoding,
-                           { 'delimiter': self.options.csv_delimiter.replace('\\t', '\t') },
-                           self.options.ignorefirst,
-                           self.options.xidx, yidxarray)
+    (nodeid,node) = self.svg.selected.popitem()
+    self.pathwriter = PathWriter(self.options.path_precision,
+                                 self.options.path_relative,
+                                 self.options.path_simplify*self.svg.unittouu('1px'),
+                                 self.options.path_report)
+    self.xscale = makeScale(self.options.xscale, self.options.xlinthresh)
+    self.yscale = makeScale(self.options.yscale, self.options.ylinthresh)
     
-    if self.data.len() < 2:
-      raise AbortExtension(_("Less than 2 pairs of values. Nothing to plot."))
+    if self.options.streaming and (self.options.series or self.options.incremental
+                                   or self.options.storedata or self.options.render == 'density'):
+      raise AbortExtension(_("The streaming mode plots the paths of a single CSV-file, without incremental mode or saved data."))
     
-    # sort by x-values for a proper line
-    self.data.sort()
+    # a plot created in incremental mode only gets the new rows of the CSV-file
+    if self.options.incremental and not self.options.series:
+      try:
+        if detectFormat(self.options.csv_file) != 'csv':
+          raise AbortExtension(_("The incremental mode needs an uncompressed CSV-file."))
+      except OSError:
+        pass # the file is reported missing while reading
+    state = self.readState(node) if self.options.incremental else None
+    if state is not None and self.appendData(node, state, yidxarray):
+      if self.options.path_report:
+        errormsg(self.pathwriter.report())
+      return node
     
-    self.data.calculateMinMax()
+    # get CSV data, sorted by x-values for a proper line
+    if self.options.series:
+      if self.options.incremental:
+        raise AbortExtension(_("The incremental mode needs a single CSV-file."))
+      try:
+        series = parseSeries(self.options.series)
+      except ValueError as e:
+        raise AbortExtension(str(e))
+      yidxarray = list(range(len(series)))
+      self.data = self.readSources(series)
+    elif self.options.streaming:
+      self.data = self.scanData(yidxarray)
+    else:
+      self.data = self.readData(yidxarray)
+
+    if self.data.len() < 2:
+      raise AbortExtension(_("Less than 2 pairs of values. Nothing to plot."))
+
+    # with manual x-limits only the rows in between (found by binary search) are scaled and plotted
+    self.window = None
+    manual = not (self.options.xmin_autodetect and self.options.xmax_autodetect)
+    if manual and not (self.options.streaming or self.options.incremental):
+      self.window = (-math.inf if self.options.xmin_autodetect else self.options.xmin,
+                     math.inf if self.options.xmax_autodetect else self.options.xmax)
+    with self.profiler.stage('min/max'):
+      self.data.calculateMinMax(self.window)
 
     # Get minima and maxima for x- and y-values
-    self.xmin = self.data.getXMin() if self.options.xmin_autodetect else self.options.xmin
-    self.xmax = self.data.getXMax() if self.options.xmax_autodetect else self.options.xmax
+    series = [self.data.getSeries(i, self.window) for i in range(self.data.nYCols)]
+    xcolumns = list({id(x): x for (x, y) in series}.values()) # shared by all series of a file
+    (xmin, xmax) = self.xscale.autoRange((self.data.getXMin(), self.data.getXMax()), xcolumns)
+    self.xmin = xmin if self.options.xmin_autodetect else self.options.xmin
+    self.xmax = xmax if self.options.xmax_autodetect else self.options.xmax
     if self.xmin >= self.xmax:
       raise AbortExtension(_('xmin > xmax'))
     
-    self.ymin = self.data.getYMin() if self.options.ymin_autodetect else self.options.ymin
-    self.ymax = self.data.getYMax() if self.options.ymax_autodetect else self.options.ymax
+    (ymin, ymax) = self.yscale.autoRange((self.data.getYMin(), self.data.getYMax()), [y for (x, y) in series])
+    self.ymin = ymin if self.options.ymin_autodetect else self.options.ymin
+    self.ymax = ymax if self.options.ymax_autodetect else self.options.ymax
     if self.ymin >= self.ymax:
       raise AbortExtension(_('ymin > ymax'))
     
-    # Get the parent of the node
-    (nodeid,node) = self.svg.selected.popitem()
-    self.bb = node.bounding_box()
+    if not (self.xscale.valid(self.xmin) and self.yscale.valid(self.ymin)):
+      raise AbortExtension(_('A logarithmic axis needs a minimum > 0.'))
+    self.scaleRanges()
+    
+    # Get the parent of the node, a rebuilt plot keeps the size of the old one
+    if state is not None:
+      (left, right, top, bottom) = state['bb']
+      self.bb = BoundingBox((left, right), (top, bottom))
+    else:
+      self.bb = node.bounding_box()
     parent = node.getparent()
     group = Group()
     parent.add(group)
 
     # get axis and path
-    xAchse = Axis(Vector2d(self.bb.left,self.bb.bottom),Vector2d(self.bb.right,self.bb.bottom),self.xmin,self.xmax)
-    yAchse = Axis(Vector2d(self.bb.left,self.bb.bottom),Vector2d(self.bb.left ,self.bb.top)   ,self.ymin,self.ymax)
+    xAchse = Axis(Vector2d(self.bb.left,self.bb.bottom),Vector2d(self.bb.right,self.bb.bottom),self.xmin,self.xmax,self.xscale)
+    yAchse = Axis(Vector2d(self.bb.left,self.bb.bottom),Vector2d(self.bb.left ,self.bb.top)   ,self.ymin,self.ymax,self.yscale)
+    
+    merged = self.options.merge_lines
     
     plot = []
-    for i in range(len(yidxarray)):
-      plot.append( self.plotPath(pathstyle,i) )
+    if self.options.render == 'density':
+      with self.profiler.stage('density raster'):
+        plot.append( self.densityImage() )
+    elif self.options.streaming:
+      for pathstr in self.streamData(yidxarray):
+        plot.append( self.pathElement(pathstr, pathstyle) )
+    else:
+      workers = self.options.path_workers or os.cpu_count() or 1
+      pathdata = self.seriesPaths().paths(series, workers)
+      for i in range(len(yidxarray)):
+        points = self.pathwriter.pointsWritten
+        with self.profiler.stage('plotPath {}'.format(i)):
+          plot.append( self.pathElement(next(pathdata), pathstyle) )
+        self.profiler.count('points series {}'.format(i), self.pathwriter.pointsWritten-points)
+        self.profiler.count('path bytes', len(plot[i].get('d')))
+        if self.options.incremental:
+          plot[i].set(SERIES_ATTRIBUTE, str(i))
+    if self.options.path_report:
+      errormsg(self.pathwriter.report())
 
     # evaluate options and add all together
+    stage = self.profiler.stage
     if self.options.xgrid:
-      group.add(xAchse.getTicks(   self.options.xtickn,                         0, -self.bb.height, gridstyle))
-      group.add(xAchse.getSubTicks(self.options.xtickn, self.options.xsubtickn, 0, -self.bb.height, subgridstyle))
+      with stage('x-axis grid'):
+        group.add(xAchse.getTicks(   self.options.xtickn,                         0, -self.bb.height, gridstyle, merged))
+        group.add(xAchse.getSubTicks(self.options.xtickn, self.options.xsubtickn, 0, -self.bb.height, subgridstyle, merged))
     if self.options.ygrid:
-      group.add(yAchse.getTicks(   self.options.ytickn,                         0, self.bb.width, gridstyle))
-      group.add(yAchse.getSubTicks(self.options.ytickn, self.options.ysubtickn, 0, self.bb.width, subgridstyle))
+      with stage('y-axis grid'):
+        group.add(yAchse.getTicks(   self.options.ytickn,                         0, self.bb.width, gridstyle, merged))
+        group.add(yAchse.getSubTicks(self.options.ytickn, self.options.ysubtickn, 0, self.bb.width, subgridstyle, merged))
     if self.options.xtickn > 0:
       tlvon = -self.ticksize if self.options.xticksin  else 0
       tlbis =  self.ticksize if self.options.xticksout else 0
-      group.add(xAchse.getTicks(   self.options.xtickn,                            tlvon,    tlbis, tickstyle))
-      group.add(xAchse.getSubTicks(self.options.xtickn, self.options.xsubtickn, .5*tlvon, .5*tlbis, subtickstyle))
-      group.add(xAchse.getNumbers( self.options.xtickn, self.options.xformat, 3*self.ticksize, 0, textzentriert))
+      with stage('x-axis ticks'):
+        group.add(xAchse.getTicks(   self.options.xtickn,                            tlvon,    tlbis, tickstyle, merged))
+      with stage('x-axis subticks'):
+        group.add(xAchse.getSubTicks(self.options.xtickn, self.options.xsubtickn, .5*tlvon, .5*tlbis, subtickstyle, merged))
+      with stage('x-axis numbers'):
+        group.add(xAchse.getNumbers( self.options.xtickn, self.options.xformat, 3*self.ticksize, 0, textzentriert))
     if self.options.ytickn > 0:
       tlvon = -self.ticksize if self.options.yticksout else 0
       tlbis =  self.ticksize if self.options.yticksin  else 0
-      group.add(yAchse.getTicks(   self.options.ytickn,                            tlvon,    tlbis, tickstyle))
-      group.add(yAchse.getSubTicks(self.options.ytickn, self.options.ysubtickn, .5*tlvon, .5*tlbis, subtickstyle))
-      group.add(yAchse.getNumbers( self.options.ytickn, self.options.yformat, -2*self.ticksize, -.3*self.fontsize, textrechtsbdg))
+      with stage('y-axis ticks'):
+        group.add(yAchse.getTicks(   self.options.ytickn,                            tlvon,    tlbis, tickstyle, merged))
+      with stage('y-axis subticks'):
+        group.add(yAchse.getSubTicks(self.options.ytickn, self.options.ysubtickn, .5*tlvon, .5*tlbis, subtickstyle, merged))
+      with stage('y-axis numbers'):
+        group.add(yAchse.getNumbers( self.options.ytickn, self.options.yformat, -2*self.ticksize, -.3*self.fontsize, textrechtsbdg))
     
-    for i in range(len(yidxarray)):
-      group.add(plot[i])
-
-    if self.options.border_left:
-      group.add( self.createBorderLine('left', borderstyle) )
-    if self.options.border_bottom:
-      group.add( self.createBorderLine('bottom', borderstyle) )
-    if self.options.border_right:
-      group.add( self.createBorderLine('right', borderstyle) )
-    if self.options.border_top:
-      group.add( self.createBorderLine('top', borderstyle) )
-    if self.options.label_title:
-      group.add( textAt(self.bb.center.x,self.bb.minimum.y-self.fontsize,self.options.label_title, texttitle) )
-    if self.options.label_yaxis:
-      group.add( textAt(self.bb.minimum.x-4*self.fontsize,self.bb.center.y,self.options.label_yaxis, textzentriert,-90) )
-    if self.options.label_xaxis:
-      group.add( textAt(self.bb.center.x,self.bb.maximum.y+3.5*self.fontsize,self.options.label_xaxis, textzentriert) )
+    with stage('DOM insertion'):
+      for element in plot:
+        group.add(element)
+      if self.options.border_left:
+        group.add( self.createBorderLine('left', borderstyle) )
+      if self.options.border_bottom:
+        group.add( self.createBorderLine('bottom', borderstyle) )
+      if self.options.border_right:
+        group.add( self.createBorderLine('right', borderstyle) )
+      if self.options.border_top:
+        group.add( self.createBorderLine('top', borderstyle) )
+      if self.options.label_title:
+        group.add( textAt(self.bb.center.x,self.bb.minimum.y-self.fontsize,self.options.label_title, texttitle) )
+      if self.options.label_yaxis:
+        group.add( textAt(self.bb.minimum.x-4*self.fontsize,self.bb.center.y,self.options.label_yaxis, textzentriert,-90) )
+      if self.options.label_xaxis:
+        group.add( textAt(self.bb.center.x,self.bb.maximum.y+3.5*self.fontsize,self.options.label_xaxis, textzentriert) )
 
     if self.options.storedata:
-      group.set('data-values',str(self.data))
+      group.set('data-values',json.dumps(self.data.toDict()))
+    if self.options.incremental:
+      group.set(STATE_ATTRIBUTE, json.dumps(self.plotState()))
     
-    if self.options.remove:
+    if self.options.remove or state is not None:
       parent.remove(node)
     
-      
+    return group
+    
+
+def batchArguments(job):
+  "Command line of XY_Data_Plot for a job of the manifest, the option names are the ones of the arg_parser."
+
+  args = ['--id={}'.format(job['id']), '--csv_file={}'.format(job['csv_file'])]
+  for (name, value) in job.get('options', {}).items():
+    if isinstance(value, bool):
+      value = 'true' if value else 'false'
+    args.append('--{}={}'.format(name.lstrip('-'), value))
+  args.append(job['template'])
+  return args
+
+def readManifest(manifest):
+  """Reads the jobs of a JSON-manifest: a list (or {"jobs": [...]}) of objects with template, id,
+  csv_file, output and options. Relative paths are relative to the manifest. Every job is checked
+  on its own, a job that cannot run gets the reason as error and fails without stopping the others."""
+
+  with open(manifest, encoding='utf-8') as f:
+    jobs = json.load(f)
+  if isinstance(jobs, dict):
+    jobs = jobs['jobs']
+  base = os.path.dirname(os.path.abspath(manifest))
+  for (index, job) in enumerate(jobs):
+    if not isinstance(job, dict):
+      jobs[index] = {'error': 'The job is not a JSON object: {}'.format(json.dumps(job))}
+      continue
+    for key in ('template', 'csv_file', 'output'):
+      if isinstance(job.get(key), str):
+        job[key] = os.path.join(base, job[key])
+    missing = [key for key in ('template', 'id', 'csv_file') if not isinstance(job.get(key), str)]
+    if missing:
+      job['error'] = 'The job needs {}.'.format(', '.join(missing))
+    elif not isinstance(job.get('options', {}), dict):
+      job['error'] = 'The options of the job are not a JSON object.'
+    else:
+      job.setdefault('output', os.path.splitext(job['csv_file'])[0]+'.svg')
+  return jobs
+
+def renderJob(job):
+  "Runs one job in the current process and returns its status, a failing job never raises."
+
+  import io
+  import time
+  status = {'output': job.get('output'), 'status': 'ok', 'seconds': 0.0, 'message': ''}
+  if 'error' in job:
+    status.update(status='failed', message=job['error'])
+    return status
+  start = time.perf_counter()
+  stderr = sys.stderr
+  sys.stderr = messages = io.StringIO()
+  try:
+    XY_Data_Plot().run(batchArguments(job), job['output'])
+  except SystemExit as e:
+    if e.code:
+      status['status'] = 'failed'
+  except Exception as e:
+    status['status'] = 'failed'
+    messages.write('{}: {}\n'.format(type(e).__name__, e))
+  finally:
+    sys.stderr = stderr
+  status['seconds'] = time.perf_counter()-start
+  status['message'] = messages.getvalue().strip()
+  return status
+
+def runBatch(argv=None):
+  """Renders all jobs of a manifest in a process pool, every worker process loads inkex only once.
+  Writes a JSON-report with timing and status of every job, returns 1 if a job failed."""
+
+  import argparse
+  from concurrent.futures import ProcessPoolExecutor
+  parser = argparse.ArgumentParser(description='Renders many xy-data-plots from a JSON-manifest.')
+  parser.add_argument('--batch', dest='manifest', required=True, help='JSON-manifest with the jobs')
+  parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='number of worker processes, 1: no pool')
+  parser.add_argument('--report', default='-', help='file for the JSON-report, -: stdout')
+  options = parser.parse_args(argv)
+
+  jobs = readManifest(options.manifest)
+  if options.workers > 1 and len(jobs) > 1:
+    results = []
+    with ProcessPoolExecutor(max_workers=options.workers) as pool:
+      for (job, future) in [(job, pool.submit(renderJob, job)) for job in jobs]:
+        try:
+          results.append(future.result())
+        except Exception as e: # the worker process died
+          results.append({'output': job.get('output'), 'status': 'failed', 'seconds': 0.0, 'message': repr(e)})
+  else:
+    results = [renderJob(job) for job in jobs]
+  for (index, result) in enumerate(results):
+    result['index'] = index
+
+  report = json.dumps(results, indent=2)
+  if options.report == '-':
+    print(report)
+  else:
+    with open(options.report, 'w', encoding='utf-8') as f:
+      f.write(report)
+  return 1 if any(result['status'] != 'ok' for result in results) else 0
+
 if __name__ == '__main__':
+  if any(a == '--batch' or a.startswith('--batch=') for a in sys.argv[1:]):
+    sys.exit(runBatch())
   e = XY_Data_Plot()
   e.run()
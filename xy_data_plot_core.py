@@ -0,0 +1,1599 @@
+#! /usr/bin/python3
+'''
+Copyright (C) 2020 Christian Hoffmann christian@lehrer-hoffmann.de
+
+Data and geometry core of the xy-data-plot extension: reading CSV-files, the
+columnar XYValues, scales, clipping, decimation and path encoding. It does not
+depend on inkex and can be imported on its own.
+
+This program is free software; you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation; either version 2 of the License, or
+(at your option) any later version.
+
+This program is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program; if not, write to the Free Software
+Foundation, Inc., 51 Franklin Street, Fifth Floor, Boston, MA  02110-1301, USA.
+'''
+
+from array import array
+from bisect import bisect_left, bisect_right
+from operator import itemgetter
+import csv
+import io
+import itertools
+import math
+import os
+import re
+import struct
+import sys
+import time
+import zlib
+from contextlib import contextmanager
+from gettext import gettext as _
+from importlib import import_module
+from importlib.util import find_spec
+
+class _LazyModule:
+  """Stands in for an installed module that is imported on the first attribute access and then
+  replaces the stand-in in the globals of this module. Importing NumPy takes several times longer
+  than the core itself, a run that never touches an array does not pay for it."""
+  
+  def __init__(self, name, alias):
+    self._name = name
+    self._alias = alias
+    self._module = None
+  
+  def __getattr__(self, attr):
+    if self._module is None:
+      self._module = import_module(self._name)
+      globals()[self._alias] = self._module
+    return getattr(self._module, attr)
+
+# optional accelerator, every function has a plain Python fallback; None if it is not installed
+np = _LazyModule('numpy', 'np') if find_spec('numpy') is not None else None
+
+CSV_BLOCKSIZE = 1 << 20 # characters read at once
+CSV_BLOCKROWS = 1 << 14 # rows per block when the csv-module splits the lines
+CSV_MAXERRORS = 10      # rejected rows listed in the error summary
+STREAM_BLOCKROWS = 1 << 16 # rows of a binary file per block in the streaming mode
+
+DATA_MAGICS = [           # magic bytes of the formats read besides plain CSV
+  (b'\x1f\x8b', 'gzip'),
+  (b'\xfd7zXZ\x00', 'xz'),
+  (b'\x93NUMPY', 'npy'),
+]
+RAW_EXTENSIONS = ('.f64', '.bin', '.raw') # little-endian float64, row by row, no header
+BINARY_FORMATS = ('npy', 'raw')
+
+CACHE_MAGIC = b'XYDC'
+CACHE_VERSION = 2
+CACHE_HEADER = struct.Struct('<4sHHQI') # magic, version, number of columns, number of rows, rows per index block
+CACHE_HEADERSIZE = 64                  # the columns start aligned behind the padded header
+
+RANGE_BLOCK = 1024 # rows per block of a RangeIndex
+
+DENSITY_CHUNK = 1 << 20  # points binned at once, bounds the temporary arrays
+DENSITY_MAXPX = 8192     # maximal width and height of a density raster
+DENSITY_COLORMAPS = {
+  'gray':    [(200, 200, 200), (0, 0, 0)],
+  'viridis': [(68, 1, 84), (59, 82, 139), (33, 145, 140), (94, 201, 98), (253, 231, 37)],
+  'hot':     [(80, 0, 0), (230, 0, 0), (255, 210, 0), (255, 255, 255)],
+}
+
+def errormsg(msg):
+  "Writes a message to stderr like inkex.errormsg, where Inkscape shows it."
+  
+  sys.stderr.write(msg+'\n')
+
+def getCSVData(csvfile,fileencoding,csvoptions,ignorefirst,xidx,yidxarr,decimalcomma=False,report=None,rawcolumns=2):
+  """Reads the columns xidx and yidxarr of a data file. Besides CSV-files gzip- or xz-compressed
+  CSV-files are read (streamed through the decompressor) and .npy-files and raw float64 files with
+  rawcolumns columns (memory-mapped, see getBinaryData)."""
+  
+  if report is None:
+    report = CSVReport()
+  format = detectFormat(csvfile)
+  if format in BINARY_FORMATS:
+    return getBinaryData(csvfile, format, xidx, yidxarr, rawcolumns, report)
+  data = XYValues(len(yidxarr))
+  with openCSV(csvfile, fileencoding, format) as f:
+    try:
+      for (x, ycols) in iterCSVBlocks(f, csvoptions, ignorefirst, xidx, yidxarr, decimalcomma, report):
+        data.extend(x, ycols)
+    except csv.Error as e:
+      errormsg(_("Error on importing CSV: {}\n{}\n{}".format(csvfile, report.lines, e)))
+  if report.rejected:
+    errormsg(_(report.summary()))
+  return data
+
+def parseSource(csvfile,fileencoding,csvoptions,ignorefirst,xidx,yidxarr,decimalcomma=False,rawcolumns=2):
+  "Reads and sorts one data file, e.g. in a worker process. Returns (data, report)."
+  
+  report = CSVReport()
+  data = getCSVData(csvfile, fileencoding, csvoptions, ignorefirst, xidx, yidxarr, decimalcomma, report, rawcolumns)
+  data.sort()
+  return (data, report)
+
+def readCSVRange(csvfile,fileencoding,csvoptions,ignorefirst,xidx,yidxarr,decimalcomma=False,start=0,lines=0,report=None):
+  """Reads the complete lines behind the byte offset start, lines is the number of lines before it.
+  Returns (data, end, lines) with the offset and the line number to resume reading from, an
+  incomplete last line (still being written) is left for the next call. If the file got shorter
+  than start, end is its size and nothing is read."""
+  
+  data = XYValues(len(yidxarr))
+  if report is None:
+    report = CSVReport()
+  report.lines = lines
+  with open(csvfile, 'rb') as raw:
+    size = os.fstat(raw.fileno()).st_size
+    if size < start:
+      return (data, size, lines)
+    end = _lastLineEnd(raw, size)
+    if end <= start:
+      return (data, start, lines)
+    f = io.TextIOWrapper(io.BufferedReader(_ByteRange(raw, start, end)), encoding=fileencoding, newline='')
+    try:
+      for (x, ycols) in iterCSVBlocks(f, csvoptions, ignorefirst, xidx, yidxarr, decimalcomma, report):
+        data.extend(x, ycols)
+    except csv.Error as e:
+      errormsg(_("Error on importing CSV: {}\n{}\n{}".format(csvfile, report.lines, e)))
+  if report.rejected:
+    errormsg(_(report.summary()))
+  return (data, end, report.lines)
+
+def detectFormat(filename):
+  "Format of a data file by its magic bytes or, for raw binary data, its extension: csv, gzip, xz, npy or raw."
+  
+  with open(filename, 'rb') as f:
+    head = f.read(8)
+  for (magic, format) in DATA_MAGICS:
+    if head.startswith(magic):
+      return format
+  if os.path.splitext(filename)[1].lower() in RAW_EXTENSIONS:
+    return 'raw'
+  return 'csv'
+
+def openCSV(csvfile, fileencoding, format='csv'):
+  "Opens a CSV-file as text, compressed files are decompressed while reading."
+  
+  if format == 'gzip':
+    import gzip # only needed for compressed files, keeps the import of the core light
+    return gzip.open(csvfile, 'rt', encoding=fileencoding, newline='')
+  if format == 'xz':
+    import lzma
+    return lzma.open(csvfile, 'rt', encoding=fileencoding, newline='')
+  return open(csvfile, newline='', encoding=fileencoding)
+
+def getBinaryData(filename, format, xidx, yidxarr, rawcolumns=2, report=None):
+  """Reads the columns xidx and yidxarr of a .npy-file or a raw file of little-endian float64 values
+  with rawcolumns values per row. With NumPy the file is memory-mapped and the columns are views
+  into the map, nothing is copied. There are no header lines, ignorefirst does not apply."""
+  
+  columns = _binaryColumns(filename, format, rawcolumns)
+  if report is not None:
+    report.lines = len(columns[0]) if columns else 0
+  wanted = [xidx] + list(yidxarr)
+  if max(wanted) >= len(columns):
+    raise ValueError(_("{} has {} columns, there is no column {}.").format(filename, len(columns), max(wanted)))
+  return XYValues.fromColumns(columns[xidx], [columns[i] for i in yidxarr])
+
+def _binaryColumns(filename, format, rawcolumns):
+  "The columns of a binary file, views of a memory map with NumPy, array('d') without."
+  
+  if format == 'npy':
+    (dtype, shape, fortran, offset) = _npyHeader(filename)
+  else:
+    if rawcolumns < 1:
+      raise ValueError(_("The number of columns of a raw binary file must be at least 1."))
+    size = os.path.getsize(filename)
+    if size % (8*rawcolumns):
+      raise ValueError(_("{} is not a multiple of {} float64 values.").format(filename, rawcolumns))
+    (dtype, shape, fortran, offset) = ('<f8', (size//(8*rawcolumns), rawcolumns), False, 0)
+  if len(shape) == 1:
+    shape = (shape[0], 1)
+  if len(shape) != 2:
+    raise ValueError(_("{} is not a table: shape {}.").format(filename, shape))
+  (nrows, ncols) = shape
+  if nrows == 0:
+    return [array('d') for i in range(ncols)]
+  
+  if np is not None:
+    table = np.memmap(filename, dtype=dtype, mode='r', offset=offset, shape=shape, order='F' if fortran else 'C')
+    return [table[:, i] for i in range(ncols)]
+  if dtype not in ('<f8', '>f8'):
+    raise ValueError(_("Without NumPy only float64 data can be read, {} has {}.").format(filename, dtype))
+  values = array('d')
+  with open(filename, 'rb') as f:
+    f.seek(offset)
+    values.fromfile(f, nrows*ncols)
+  if (dtype == '<f8') != (sys.byteorder == 'little'):
+    values.byteswap()
+  if fortran:
+    return [values[i*nrows:(i+1)*nrows] for i in range(ncols)]
+  return [values[i::ncols] for i in range(ncols)]
+
+def _npyHeader(filename):
+  "Returns (dtype, shape, fortran_order, data offset) of a .npy-file."
+  
+  import ast
+  with open(filename, 'rb') as f:
+    prefix = f.read(10)
+    major = prefix[6]
+    if major == 1:
+      length = struct.unpack('<H', prefix[8:10])[0]
+      start = 10
+    else:
+      length = struct.unpack('<I', prefix[8:10]+f.read(2))[0]
+      start = 12
+    try:
+      header = ast.literal_eval(f.read(length).decode('latin1'))
+      return (header['descr'], tuple(header['shape']), header['fortran_order'], start+length)
+    except (SyntaxError, ValueError, KeyError, TypeError):
+      raise ValueError(_("{} has no valid .npy-header.").format(filename))
+
+def iterDataBlocks(csvfile,fileencoding,csvoptions,ignorefirst,xidx,yidxarr,decimalcomma=False,report=None,rawcolumns=2):
+  """Yields the columns xidx and yidxarr of a data file in blocks (x, [y0, y1, ...]) for every format
+  of getCSVData, nothing is kept between the blocks. Without NumPy a binary file is read at once.
+  With NumPy the columns are NumPy-arrays, like the columns of getCSVData.
+  Raises ValueError if the CSV-module gives up, rejected rows are only counted in report."""
+  
+  for (x, ycols) in _iterDataBlocks(csvfile,fileencoding,csvoptions,ignorefirst,xidx,yidxarr,decimalcomma,report,rawcolumns):
+    if np is not None:
+      (x, ycols) = (np.asarray(x, dtype=float), [np.asarray(y, dtype=float) for y in ycols])
+    yield (x, ycols)
+
+def _iterDataBlocks(csvfile,fileencoding,csvoptions,ignorefirst,xidx,yidxarr,decimalcomma,report,rawcolumns):
+  "The blocks of iterDataBlocks as they are read."
+  
+  if report is None:
+    report = CSVReport()
+  format = detectFormat(csvfile)
+  if format in BINARY_FORMATS:
+    data = getBinaryData(csvfile, format, xidx, yidxarr, rawcolumns, report)
+    for start in range(0, data.len(), STREAM_BLOCKROWS):
+      end = start+STREAM_BLOCKROWS
+      yield (data.x[start:end], [col[start:end] for col in data.y])
+    return
+  with openCSV(csvfile, fileencoding, format) as f:
+    try:
+      yield from iterCSVBlocks(f, csvoptions, ignorefirst, xidx, yidxarr, decimalcomma, report)
+    except csv.Error as e:
+      raise ValueError(_("Error on importing CSV: {}\n{}\n{}").format(csvfile, report.lines, e))
+
+def _lastLineEnd(f, size):
+  "Offset behind the last line break in the first size bytes of the binary file f."
+  
+  pos = size
+  while pos > 0:
+    n = min(CSV_BLOCKSIZE, pos)
+    f.seek(pos-n)
+    i = f.read(n).rfind(b'\n')
+    if i >= 0:
+      return pos-n+i+1
+    pos -= n
+  return 0
+
+class _ByteRange(io.RawIOBase):
+  "Read-only view of the bytes start to end of the binary file f."
+  
+  def __init__(self, f, start, end):
+    f.seek(start)
+    self.f = f
+    self.remaining = end-start
+  
+  def readable(self):
+    return True
+  
+  def readinto(self, b):
+    n = self.f.readinto(memoryview(b)[:self.remaining])
+    self.remaining -= n
+    return n
+
+class StageProfiler:
+  """Collects the time of named stages and counters of a run. A disabled profiler does nothing,
+  so the stages can stay in the code."""
+  
+  def __init__(self, enabled=True):
+    self.enabled = enabled
+    self.stages = {}
+    self.counters = {}
+  
+  @contextmanager
+  def stage(self, name):
+    if not self.enabled:
+      yield
+      return
+    start = time.perf_counter()
+    try:
+      yield
+    finally:
+      self.stages[name] = self.stages.get(name, 0.0) + time.perf_counter()-start
+  
+  def count(self, name, n=1):
+    if self.enabled:
+      self.counters[name] = self.counters.get(name, 0) + n
+  
+  def report(self):
+    return {'seconds': self.stages, 'counters': self.counters}
+
+class CSVReport:
+  "Counts the lines read and collects the first rejected rows of a CSV import."
+  
+  def __init__(self, maxerrors=CSV_MAXERRORS):
+    self.maxerrors = maxerrors
+    self.lines = 0
+    self.rejected = 0
+    self.messages = []
+  
+  def reject(self, message):
+    self.rejected += 1
+    if len(self.messages) < self.maxerrors:
+      self.messages.append(message)
+  
+  def summary(self):
+    return "{} rows rejected, first {}:\n{}".format('{:,}'.format(self.rejected).replace(',',' '), len(self.messages), "\n".join(self.messages))
+
+def iterCSVBlocks(f, csvoptions, ignorefirst, xidx, yidxarr, decimalcomma=False, report=None, blocksize=CSV_BLOCKSIZE):
+  """Reads the text-file f block by block and yields (x, [y0, y1, ...]) for every block, the columns
+  are array('d'). Only the columns xidx and yidxarr are split off and converted. Lines are read with
+  str.split as long as no quote character occurs, after that the csv-module takes over."""
+  
+  if report is None:
+    report = CSVReport()
+  cols = [xidx] + list(yidxarr)
+  maxsplit = max(cols)+1
+  delimiter = csvoptions.get('delimiter', ',')
+  quotechar = csvoptions.get('quotechar', '"')
+  simple = set(csvoptions) <= {'delimiter'}
+  lines = []
+  while simple:
+    lines = f.readlines(blocksize)
+    if not lines:
+      return
+    if any(quotechar in line for line in lines):
+      break
+    rows = []
+    numbers = []
+    for line in lines:
+      report.lines += 1
+      if report.lines <= ignorefirst:
+        continue
+      line = line.rstrip('\r\n')
+      rows.append(line.split(delimiter, maxsplit) if line else [])
+      numbers.append(report.lines)
+    yield _convertCSVBlock(rows, numbers, cols, decimalcomma, report)
+  
+  # quoted fields or special options: let the csv-module split the rest of the file
+  offset = report.lines
+  reader = csv.reader(itertools.chain(lines, f), **csvoptions)
+  while True:
+    rows = []
+    numbers = []
+    consumed = 0
+    for row in itertools.islice(reader, CSV_BLOCKROWS):
+      consumed += 1
+      report.lines = offset + reader.line_num
+      if report.lines <= ignorefirst:
+        continue
+      rows.append(row)
+      numbers.append(report.lines)
+    if not consumed:
+      return
+    yield _convertCSVBlock(rows, numbers, cols, decimalcomma, report)
+
+def _convertCSVBlock(rows, numbers, cols, decimalcomma, report):
+  "Converts the wanted columns of a block in bulk, only a block with errors is converted row by row."
+  
+  tofloat = (lambda s: float(s.replace(',','.'))) if decimalcomma else float
+  try:
+    columns = [array('d', map(tofloat, map(itemgetter(col), rows))) for col in cols]
+  except (ValueError, IndexError):
+    columns = [array('d') for col in cols]
+    for (row, number) in zip(rows, numbers):
+      try:
+        values = [tofloat(row[col]) for col in cols]
+      except ValueError:
+        report.reject("Float error: line {}: {}".format(number, row))
+      except IndexError:
+        report.reject("Not enough fields in line {}: {}".format(number, row))
+      else:
+        for (column, value) in zip(columns, values):
+          column.append(value)
+  return (columns[0], columns[1:])
+
+def defaultCacheDir():
+  base = os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache')
+  return os.path.join(base, 'xy-data-plot')
+
+class CSVCache:
+  """On-disk cache of parsed and sorted CSV columns. An entry is a binary file with a small header
+  followed by the x-column and the y-columns as little-endian float64, so it can be memory-mapped,
+  and the block minima and maxima of the y-columns (see RangeIndex).
+  The key contains path, size, mtime and content hash of the CSV file and all parse options.
+  Old entries are removed (least recently used first) when the cache grows above maxbytes."""
+
+  def __init__(self, directory=None, maxbytes=1 << 30):
+    self.directory = directory or defaultCacheDir()
+    self.maxbytes = maxbytes
+
+  def key(self, csvfile, **options):
+    stat = os.stat(csvfile)
+    import hashlib # only needed with the cache, keeps the import of the core light
+    import json
+    content = hashlib.sha256()
+    with open(csvfile, 'rb') as f:
+      for chunk in iter(lambda: f.read(CSV_BLOCKSIZE), b''):
+        content.update(chunk)
+    ident = {
+      'path': os.path.abspath(csvfile),
+      'size': stat.st_size,
+      'mtime': stat.st_mtime_ns,
+      'content': content.hexdigest(),
+      'options': options,
+    }
+    return hashlib.sha256(json.dumps(ident, sort_keys=True).encode()).hexdigest()
+
+  def path(self, key):
+    return os.path.join(self.directory, key+'.xyd')
+
+  def load(self, key):
+    "Returns the cached XYValues or None. The columns are read-only memory maps if NumPy is available."
+
+    filename = self.path(key)
+    try:
+      with open(filename, 'rb') as f:
+        (magic, version, ncols, nrows, block) = CACHE_HEADER.unpack(f.read(CACHE_HEADER.size))
+        if magic != CACHE_MAGIC or version != CACHE_VERSION or ncols < 2 or block < 1:
+          return None
+        nblocks = -(-nrows // block)
+        if np is not None:
+          columns = list(np.memmap(f, dtype='<f8', mode='r', offset=CACHE_HEADERSIZE, shape=(ncols, nrows)))
+          extremes = list(np.memmap(f, dtype='<f8', mode='r', offset=CACHE_HEADERSIZE+8*ncols*nrows,
+                                    shape=(2*(ncols-1), nblocks)))
+        else:
+          f.seek(CACHE_HEADERSIZE)
+          columns = [self._read(f, nrows) for i in range(ncols)]
+          extremes = [self._read(f, nblocks) for i in range(2*(ncols-1))]
+      os.utime(filename) # mark as recently used
+    except (OSError, EOFError, struct.error, ValueError):
+      return None
+    data = XYValues.fromColumns(columns[0], columns[1:])
+    for (i, column) in enumerate(data.y):
+      data.indexes[i] = RangeIndex(column, block, extremes[2*i], extremes[2*i+1])
+    return data
+
+  @staticmethod
+  def _read(f, n):
+    column = array('d')
+    column.fromfile(f, n)
+    if sys.byteorder == 'big':
+      column.byteswap()
+    return column
+
+  def store(self, key, data):
+    "Writes the columns of data atomically into the cache and evicts old entries."
+
+    columns = [data.x] + list(data.y)
+    for i in range(data.nYCols):
+      index = data.rangeIndex(i)
+      columns.extend((index.mins, index.maxs))
+    try:
+      os.makedirs(self.directory, exist_ok=True)
+      import tempfile
+      (fd, tmpname) = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+      with os.fdopen(fd, 'wb') as f:
+        f.write(CACHE_HEADER.pack(CACHE_MAGIC, CACHE_VERSION, data.nYCols+1, data.len(), RANGE_BLOCK).ljust(CACHE_HEADERSIZE, b'\0'))
+        for column in columns:
+          column = array('d', column)
+          if sys.byteorder == 'big':
+            column.byteswap()
+          column.tofile(f)
+      os.replace(tmpname, self.path(key))
+    except OSError as e:
+      errormsg(_("Could not write the CSV cache: {}".format(e)))
+      return
+    self.evict()
+
+  def evict(self):
+    "Removes the least recently used entries until the cache is not larger than maxbytes."
+
+    entries = []
+    for entry in os.scandir(self.directory):
+      if entry.name.endswith('.xyd'):
+        stat = entry.stat()
+        entries.append((stat.st_mtime, stat.st_size, entry.path))
+    total = sum(size for (mtime, size, path) in entries)
+    for (mtime, size, path) in sorted(entries):
+      if total <= self.maxbytes:
+        break
+      try:
+        os.remove(path)
+      except OSError:
+        continue
+      total -= size
+
+# Helper function for getting proper min-max-values
+def ceil( n, decimals = None ):
+  if not decimals:
+    decimals = 1 if n == 0 else int( math.log10(abs(n)) )
+  multiplier = 10 ** decimals
+  return math.ceil(n / multiplier) * multiplier
+
+def floor( n, decimals = None ):
+  if not decimals:
+    decimals = 1 if n == 0 else int( math.log10(abs(n)) )
+  multiplier = 10 ** decimals
+  return math.floor(n / multiplier) * multiplier
+
+def roundRange( vmin, vmax ):
+  "The autodetected axis range for data between vmin and vmax."
+  
+  vmax = ceil(vmax)
+  vmin = floor(vmin, decimals = 1 if vmax == 0 else int( math.log10(abs(vmax)) ) )
+  return (vmin, vmax)
+
+def intersectionParameter(s0,s1,smax):
+  if s1 == s0:
+    return math.inf
+  return (smax-s0)/(s1-s0)
+
+def intersectionPoint(values,prevalues,xmin,xmax,ymin,ymax):
+  sxmin = intersectionParameter(prevalues['x'],values['x'],xmin)
+  sxmax = intersectionParameter(prevalues['x'],values['x'],xmax)
+  symin = intersectionParameter(prevalues['y'],values['y'],ymin)
+  symax = intersectionParameter(prevalues['y'],values['y'],ymax)
+  s = 1
+  if sxmin >= 0 and sxmin < 1 and sxmin < s:
+    s = sxmin
+  if sxmax >= 0 and sxmax < 1 and sxmax < s:
+    s = sxmax
+  if symin >= 0 and symin < 1 and symin < s:
+    s = symin
+  if symax >= 0 and symax < 1 and symax < s:
+    s = symax
+  return {'x': prevalues['x']+s*(values['x']-prevalues['x']), 'y': prevalues['y']+s*(values['y']-prevalues['y'])}
+
+def clipPolyline(x, y, xmin, xmax, ymin, ymax):
+  """Clips the polyline x,y to the open rectangle xmin < x < xmax, ymin < y < ymax.
+  Returns (moves, px, py, startsInside): the points of the clipped polyline, moves[i] is True
+  if px[i],py[i] starts a new subpath. startsInside is True if the first data point is visible."""
+  
+  if np is not None:
+    return _clipPolylineNumpy(np.asarray(x, dtype=float), np.asarray(y, dtype=float), xmin, xmax, ymin, ymax)
+  return _clipPolylinePython(x, y, xmin, xmax, ymin, ymax)
+
+def _clipPolylineNumpy(x, y, xmin, xmax, ymin, ymax):
+  n = len(x)
+  inside = (x > xmin) & (x < xmax) & (y > ymin) & (y < ymax)
+  if n == 0:
+    return (np.zeros(0, dtype=bool), x, y, False)
+  
+  # per data point: how many points are emitted and where in the output they start
+  prev = inside[:-1]
+  cur = inside[1:]
+  enter = np.concatenate(([False], cur & ~prev))
+  leave = np.concatenate(([False], ~cur & prev))
+  counts = inside.astype(np.intp) + enter
+  counts += leave
+  starts = np.cumsum(counts) - counts
+  total = int(counts.sum())
+  
+  px = np.empty(total)
+  py = np.empty(total)
+  moves = np.zeros(total, dtype=bool)
+  
+  # the data points themselves, behind the intersection point when entering
+  idx = np.flatnonzero(inside)
+  pos = starts[idx] + enter[idx]
+  px[pos] = x[idx]
+  py[pos] = y[idx]
+  if inside[0]:
+    moves[0] = True
+  
+  # intersections with the border, solved for all crossings at once
+  cross = np.flatnonzero(enter | leave)
+  x0 = x[cross-1]
+  y0 = y[cross-1]
+  x1 = x[cross]
+  y1 = y[cross]
+  s = np.ones(len(cross))
+  with np.errstate(divide='ignore', invalid='ignore'):
+    for (s0, s1, smax) in ((x0, x1, xmin), (x0, x1, xmax), (y0, y1, ymin), (y0, y1, ymax)):
+      t = np.where(s1 == s0, math.inf, (smax-s0)/(s1-s0))
+      s = np.where((t >= 0) & (t < 1) & (t < s), t, s)
+  pos = starts[cross]
+  px[pos] = x0+s*(x1-x0)
+  py[pos] = y0+s*(y1-y0)
+  moves[pos] = enter[cross]
+  
+  return (moves, px, py, bool(inside[0]))
+
+def _clipPolylinePython(x, y, xmin, xmax, ymin, ymax):
+  moves = []
+  px = []
+  py = []
+  startsInside = False
+  prevalues = None
+  previnside = False
+  for (xv, yv) in zip(x, y):
+    values = {'x': xv, 'y': yv}
+    inside = xv > xmin and xv < xmax and yv > ymin and yv < ymax
+    if prevalues is None:
+      startsInside = inside
+    elif inside != previnside:
+      interpoint = intersectionPoint(values,prevalues,xmin,xmax,ymin,ymax)
+      moves.append(inside)
+      px.append(interpoint['x'])
+      py.append(interpoint['y'])
+    if inside:
+      moves.append(prevalues is None)
+      px.append(xv)
+      py.append(yv)
+    prevalues = values
+    previnside = inside
+  return (moves, px, py, startsInside)
+
+def _window(x, xmin, xmax):
+  "Indices lo, hi of the sorted column x, so that x[lo:hi] are the values with xmin < x < xmax."
+  
+  if np is not None:
+    return (int(np.searchsorted(x, xmin, side='right')), int(np.searchsorted(x, xmax, side='left')))
+  return (bisect_right(x, xmin), bisect_left(x, xmax))
+
+def _keepNeighbours(keep, lo, hi, n):
+  "Adds the last point left of the window and the first point right of it, they are needed for clipping."
+  
+  if lo > 0:
+    keep.append(lo-1)
+  if hi < n:
+    keep.append(hi)
+  return keep
+
+def decimateMinMax(x, y, xmin, xmax, buckets):
+  """Reduces the series x,y (sorted by x) to the first, minimal, maximal and last point of every of
+  the buckets equal columns between xmin and xmax. Points outside of the x-range are dropped
+  except the neighbours of the window, so the clipping at the border stays correct."""
+  
+  n = len(x)
+  (lo, hi) = _window(x, xmin, xmax)
+  scale = buckets/(xmax-xmin)
+  if np is not None:
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    keep = _keepNeighbours([], lo, hi, n)
+    if hi > lo:
+      ywin = y[lo:hi]
+      col = np.minimum(((x[lo:hi]-xmin)*scale).astype(np.intp), buckets-1)
+      starts = np.concatenate(([0], np.flatnonzero(np.diff(col))+1))
+      ends = np.append(starts[1:], hi-lo)
+      bucket = np.repeat(np.arange(len(starts)), ends-starts)
+      for extremum in (np.minimum, np.maximum):
+        hit = np.flatnonzero(ywin == extremum.reduceat(ywin, starts)[bucket])
+        (unused, first) = np.unique(bucket[hit], return_index=True)
+        keep.append(hit[first]+lo)
+      keep.append(starts+lo)
+      keep.append(ends-1+lo)
+    keep = np.unique(np.concatenate([np.atleast_1d(np.asarray(k, dtype=np.intp)) for k in keep]))
+    return (x[keep], y[keep])
+  
+  keep = _keepNeighbours([], lo, hi, n)
+  current = None
+  for i in range(lo, hi):
+    c = min(int((x[i]-xmin)*scale), buckets-1)
+    if c != current:
+      if current is not None:
+        keep.extend((first, imin, imax, i-1))
+      current = c
+      first = imin = imax = i
+    elif y[i] < y[imin]:
+      imin = i
+    elif y[i] > y[imax]:
+      imax = i
+  if current is not None:
+    keep.extend((first, imin, imax, hi-1))
+  keep = sorted(set(keep))
+  return (array('d', [x[i] for i in keep]), array('d', [y[i] for i in keep]))
+
+def decimateLTTB(x, y, xmin, xmax, threshold):
+  """Reduces the series x,y (sorted by x) between xmin and xmax to threshold points with the
+  Largest-Triangle-Three-Buckets algorithm. The neighbours of the x-range are kept for clipping."""
+  
+  n = len(x)
+  (lo, hi) = _window(x, xmin, xmax)
+  if np is not None:
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+  keep = _keepNeighbours([], lo, hi, n)
+  if hi-lo <= threshold:
+    keep.extend(range(lo, hi))
+  else:
+    keep.append(lo)
+    every = (hi-lo-2)/(threshold-2)
+    a = lo
+    for i in range(threshold-2):
+      bstart = lo+1+int(i*every)
+      bend = lo+1+int((i+1)*every)
+      nstart = bend
+      nend = min(lo+1+int((i+2)*every), hi)
+      if np is not None:
+        xavg = float(np.mean(x[nstart:nend]))
+        yavg = float(np.mean(y[nstart:nend]))
+        area = np.abs((x[a]-xavg)*(y[bstart:bend]-y[a])-(x[a]-x[bstart:bend])*(yavg-y[a]))
+        a = bstart+int(np.argmax(area))
+      else:
+        xavg = math.fsum(x[nstart:nend])/(nend-nstart)
+        yavg = math.fsum(y[nstart:nend])/(nend-nstart)
+        a = max(range(bstart, bend), key=lambda j: abs((x[a]-xavg)*(y[j]-y[a])-(x[a]-x[j])*(yavg-y[a])))
+      keep.append(a)
+    keep.append(hi-1)
+  keep.sort()
+  if np is not None:
+    return (x[keep], y[keep])
+  return (array('d', [x[i] for i in keep]), array('d', [y[i] for i in keep]))
+
+def simplifyRDP(x, y, tolerance):
+  """Ramer-Douglas-Peucker: returns the sorted indices of the points of the polyline x,y that
+  have to be kept, so that no dropped point is further than tolerance from the simplified line."""
+
+  n = len(x)
+  if n < 3 or tolerance <= 0:
+    return list(range(n))
+  keep = [0, n-1]
+  stack = [(0, n-1)]
+  while stack:
+    (first, last) = stack.pop()
+    if last-first < 2:
+      continue
+    (x0, y0, dx, dy) = (x[first], y[first], x[last]-x[first], y[last]-y[first])
+    length = math.hypot(dx, dy)
+    if np is not None:
+      xs = np.asarray(x[first+1:last])
+      ys = np.asarray(y[first+1:last])
+      if length == 0:
+        dist = np.hypot(xs-x0, ys-y0)
+      else:
+        dist = np.abs(dy*(xs-x0)-dx*(ys-y0))/length
+      i = int(np.argmax(dist))
+      dmax = float(dist[i])
+      index = first+1+i
+    else:
+      (dmax, index) = (-1.0, first)
+      for i in range(first+1, last):
+        if length == 0:
+          d = math.hypot(x[i]-x0, y[i]-y0)
+        else:
+          d = abs(dy*(x[i]-x0)-dx*(y[i]-y0))/length
+        if d > dmax:
+          (dmax, index) = (d, i)
+    if dmax > tolerance:
+      keep.append(index)
+      stack.append((first, index))
+      stack.append((index, last))
+  keep.sort()
+  return keep
+
+def _fixed(n, precision):
+  "Formats the integer n (in units of 10**-precision) as shortest decimal number."
+
+  if precision == 0:
+    return str(n)
+  digits = str(abs(n)).rjust(precision+1, '0')
+  frac = digits[-precision:].rstrip('0')
+  number = digits[:-precision] + ('.'+frac if frac else '')
+  return '-'+number if n < 0 else number
+
+class PathWriter:
+  """Encodes clipped polylines as SVG path data. precision is the number of decimals in user
+  units (negative: full precision), relative chooses the shortest of L/l/H/h/V/v for every point
+  and tolerance > 0 simplifies every subpath with Ramer-Douglas-Peucker. The counters points,
+  pointsWritten, bytes and bytesFull sum up all encoded paths."""
+
+  def __init__(self, precision=-1, relative=False, tolerance=0, measure=False):
+    self.precision = precision
+    self.relative = relative
+    self.tolerance = tolerance
+    self.measure = measure
+    self.points = 0
+    self.pointsWritten = 0
+    self.bytes = 0
+    self.bytesFull = 0
+
+  def encode(self, moves, px, py, previous=None):
+    """Returns the path data for the points px,py, moves[i] is True if point i starts a subpath.
+    If previous is the last point (x, y) of an existing path, a leading subpath without move
+    continues it."""
+
+    if not isinstance(moves, list):
+      moves = list(moves)
+    starts = [i for (i, move) in enumerate(moves) if move]
+    if not starts or starts[0] != 0:
+      starts.insert(0, 0)
+    parts = []
+    for (first, last) in zip(starts, starts[1:]+[len(moves)]):
+      if last > first:
+        self._subpath(parts, px[first:last], py[first:last], None if moves[first] else previous)
+    pathstr = ' '.join(parts)
+    self.points += len(moves)
+    self.bytes += len(pathstr)
+    if self.measure:
+      self.bytesFull += self.fullSize(px, py)
+    return pathstr
+
+  @staticmethod
+  def fullSize(px, py):
+    "Length of the path data with absolute commands at full precision."
+
+    return max(0, sum(len(str(sx))+len(str(sy))+3 for (sx, sy) in zip(px, py))-1)
+
+  def report(self):
+    return "Path data: {} of {} points, {} bytes (full precision: {} bytes)".format(
+      self.pointsWritten, self.points, self.bytes, self.bytesFull)
+
+  def counters(self):
+    return (self.points, self.pointsWritten, self.bytes, self.bytesFull)
+
+  def addCounters(self, counters):
+    "Adds the counters of another writer, e.g. one in a worker process."
+
+    (self.points, self.pointsWritten, self.bytes, self.bytesFull) = (
+      a+b for (a, b) in zip(self.counters(), counters))
+
+  def _subpath(self, parts, x, y, previous=None):
+    if previous is not None:
+      x = [previous[0]] + list(x)
+      y = [previous[1]] + list(y)
+    if self.tolerance > 0:
+      keep = simplifyRDP(x, y, self.tolerance)
+      if len(keep) < len(x):
+        x = [x[i] for i in keep] if isinstance(x, list) else x[keep]
+        y = [y[i] for i in keep] if isinstance(y, list) else y[keep]
+    if not isinstance(x, list):
+      x = x.tolist()
+      y = y.tolist()
+    self.pointsWritten += len(x) if previous is None else len(x)-1
+    if self.precision < 0:
+      fmt = str
+      qx = x
+      qy = y
+    else:
+      fmt = lambda n: _fixed(n, self.precision)
+      scale = 10**self.precision
+      qx = [round(v*scale) for v in x]
+      qy = [round(v*scale) for v in y]
+    if previous is None:
+      parts.append('M{},{}'.format(fmt(qx[0]), fmt(qy[0])))
+    if not self.relative:
+      parts.extend(['L{},{}'.format(fmt(sx), fmt(sy)) for (sx, sy) in zip(qx[1:], qy[1:])])
+      return
+    command = 'M' if previous is None else None
+    for i in range(1, len(qx)):
+      (sx, sy) = (qx[i], qy[i])
+      (dx, dy) = (sx-qx[i-1], sy-qy[i-1])
+      if dy == 0:
+        options = (('h', fmt(dx)), ('H', fmt(sx)))
+      elif dx == 0:
+        options = (('v', fmt(dy)), ('V', fmt(sy)))
+      else:
+        options = (('l', fmt(dx)+','+fmt(dy)), ('L', fmt(sx)+','+fmt(sy)))
+      (letter, args) = min(options, key=lambda option: len(option[1]))
+      if letter == command:
+        parts.append(args)
+      else:
+        parts.append(letter+args)
+        command = letter
+
+class SeriesPaths:
+  """Turns series into SVG path data: scaling, decimation, clipping, the transformation into the
+  box (left, top, width, height) and encoding with writer. ranges are the plot ranges in the space
+  of the scales (sxmin, sxmax, symin, symax). method is none, minmax or lttb and budget the number
+  of points a decimated series keeps. If a series is encoded in blocks, rows is the length of the
+  complete series and every block gets its share of the budget. The object can be sent to worker
+  processes."""
+
+  def __init__(self, xscale, yscale, ranges, box, writer, method='none', budget=0, rows=None):
+    self.xscale = xscale
+    self.yscale = yscale
+    (self.sxmin, self.sxmax, self.symin, self.symax) = ranges
+    (self.left, self.top, self.width, self.height) = box
+    self.writer = writer
+    self.method = method
+    self.budget = budget
+    self.rows = rows
+
+  def transformx(self, x):
+    "Transforms scaled x-values (see xscale) in svg x-coordinates."
+
+    return (x-self.sxmin)*self.width/(self.sxmax-self.sxmin)+self.left
+
+  def transformy(self, y):
+    "Transforms scaled y-values (see yscale) in svg y-coordinates."
+
+    return (self.symax-y)*self.height/(self.symax-self.symin)+self.top
+
+  def decimate(self, x, y):
+    "Reduces a series to the point budget."
+
+    rows = self.rows or len(x)
+    if self.method == 'none' or rows <= self.budget:
+      return (x, y)
+    if self.method == 'minmax':
+      return decimateMinMax(x, y, self.sxmin, self.sxmax, max(1, self.budget // 4))
+    return decimateLTTB(x, y, self.sxmin, self.sxmax, max(3, self.budget*len(x) // rows))
+
+  def pathData(self, x, y, continued=False, sx=None):
+    """Scales, decimates, clips and transforms the series x,y and returns the path data.
+    continued: x[0],y[0] is the last point of an existing path, the result is appended to it.
+    sx: the x-column already scaled."""
+
+    (x, y) = scaleSeries(x, y, self.xscale, self.yscale, sx)
+    (x, y) = self.decimate(x, y)
+    (moves, px, py, startsInside) = clipPolyline(x, y, self.sxmin, self.sxmax, self.symin, self.symax)
+    if np is not None:
+      px = self.transformx(px)
+      py = self.transformy(py)
+      moves = moves.tolist()
+    else:
+      px = [self.transformx(v) for v in px]
+      py = [self.transformy(v) for v in py]
+
+    if continued:
+      previous = None
+      if startsInside:
+        previous = (px[0], py[0])
+        (moves, px, py) = (moves[1:], px[1:], py[1:])
+      return self.writer.encode(moves, px, py, previous)
+
+    pathstr = self.writer.encode(moves, px, py)
+    if pathstr and not startsInside:
+      pathstr = ' ' + pathstr
+    return pathstr
+
+  def paths(self, series, workers=1):
+    """Yields the path data of every series of the list [(x, y), ...] in order, in one pass over
+    the list: an x-column shared by several series is scaled once. With workers > 1 contiguous
+    chunks of the series are encoded in worker processes. If the process pool fails, the rest of
+    the series is encoded here. The path data is the same in every case."""
+
+    done = 0
+    if workers > 1 and len(series) > 1:
+      try:
+        for (pathstr, counters) in self._parallel(series, workers):
+          self.writer.addCounters(counters)
+          done += 1
+          yield pathstr
+      except (OSError, ImportError, NotImplementedError, RuntimeError, AssertionError) as e:
+        errormsg(_("Worker processes failed, the paths are generated sequentially: {}").format(e))
+    yield from self._sequential(series[done:])
+
+  def _sequential(self, series):
+    scaled = {}
+    for (x, y) in series:
+      if id(x) not in scaled:
+        scaled[id(x)] = self.xscale.forward(x)
+      yield self.pathData(x, y, sx=scaled[id(x)])
+
+  def _parallel(self, series, workers):
+    "Yields (path data, writer counters) of every series, encoded by a process pool."
+
+    from concurrent.futures import ProcessPoolExecutor
+    size = -(-len(series) // (4*workers)) # a few chunks per worker balance the load
+    chunks = [(start, min(start+size, len(series))) for start in range(0, len(series), size)]
+    # the series reach the workers once through the initializer (with fork without a copy)
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks)),
+                             initializer=_initPathWorker, initargs=(self, series)) as pool:
+      for results in pool.map(_pathWorker, chunks):
+        yield from results
+
+def streamPaths(blocks, seriespaths, nseries):
+  """Pass two of the streaming mode: encodes the nseries series of the blocks (x, [y0, y1, ...]),
+  sorted by x, without keeping the rows. Every block continues the paths at the last valid point
+  of the block before, like the incremental mode. Returns the path data of every series."""
+
+  parts = [[] for i in range(nseries)]
+  last = [None for i in range(nseries)]
+  for (x, ycols) in blocks:
+    if not len(x):
+      continue
+    for (i, y) in enumerate(ycols):
+      if last[i] is None:
+        # no valid point so far, nothing was written
+        parts[i] = [seriespaths.pathData(x, y)]
+      else:
+        (lastx, lasty) = last[i]
+        if np is not None:
+          (xc, yc) = (np.concatenate(([lastx], x)), np.concatenate(([lasty], y)))
+        else:
+          (xc, yc) = (array('d', [lastx]) + x, array('d', [lasty]) + y)
+        pathstr = seriespaths.pathData(xc, yc, continued=True)
+        if pathstr:
+          parts[i].append(pathstr)
+      last[i] = _lastValid(x, y, seriespaths.xscale, seriespaths.yscale) or last[i]
+  paths = []
+  for p in parts:
+    if len(p) > 1 and not p[0].strip():
+      p = p[1:]
+    paths.append(' '.join(p))
+  return paths
+
+def _lastValid(x, y, xscale, yscale):
+  "The last point of x,y both scales are defined for or None."
+
+  for i in range(len(x)-1, -1, -1):
+    if xscale.valid(x[i]) and yscale.valid(y[i]):
+      return (float(x[i]), float(y[i]))
+  return None
+
+_pathWorkerState = None
+
+def _initPathWorker(paths, series):
+  global _pathWorkerState
+  _pathWorkerState = (paths, series)
+
+def _pathWorker(chunk):
+  "Encodes the series chunk[0] to chunk[1]-1 in a worker process, see SeriesPaths.paths."
+
+  (paths, series) = _pathWorkerState
+  writer = paths.writer
+  results = []
+  before = writer.counters()
+  for pathstr in paths._sequential(series[chunk[0]:chunk[1]]):
+    after = writer.counters()
+    results.append((pathstr, tuple(b-a for (a, b) in zip(before, after))))
+    before = after
+  return results
+
+def densityCounts(series, xmin, xmax, ymin, ymax, width, height, xscale=None, yscale=None, chunk=DENSITY_CHUNK):
+  """Bins the points of all series (x, y) with xmin <= x <= xmax and ymin <= y <= ymax into a
+  width x height histogram, row 0 is at ymax. Returns the counts row by row. The points are
+  scaled and binned in chunks, so the memory needed depends on the raster size only. The
+  ranges are given in the space of the scales."""
+  
+  xscale = xscale or LinearScale()
+  yscale = yscale or LinearScale()
+  xfactor = width/(xmax-xmin)
+  yfactor = height/(ymax-ymin)
+  if np is not None:
+    counts = np.zeros(width*height, dtype=np.int64)
+    for (x, y) in series:
+      for start in range(0, len(x), chunk):
+        xs = xscale.forward(np.asarray(x[start:start+chunk], dtype=float))
+        ys = yscale.forward(np.asarray(y[start:start+chunk], dtype=float))
+        inside = (xs >= xmin) & (xs <= xmax) & (ys >= ymin) & (ys <= ymax)
+        ix = np.minimum(((xs[inside]-xmin)*xfactor).astype(np.intp), width-1)
+        iy = np.minimum(((ymax-ys[inside])*yfactor).astype(np.intp), height-1)
+        counts += np.bincount(iy*width+ix, minlength=width*height)
+    return counts
+  
+  counts = [0]*(width*height)
+  for (x, y) in series:
+    for (xv, yv) in zip(x, y):
+      (xv, yv) = (xscale.forward(xv), yscale.forward(yv))
+      if xmin <= xv <= xmax and ymin <= yv <= ymax:
+        counts[min(int((ymax-yv)*yfactor), height-1)*width+min(int((xv-xmin)*xfactor), width-1)] += 1
+  return counts
+
+def colormapTable(name):
+  "256 RGB-colors interpolated between the anchors of the colormap."
+  
+  anchors = DENSITY_COLORMAPS[name]
+  table = []
+  for i in range(256):
+    pos = i/255*(len(anchors)-1)
+    k = min(int(pos), len(anchors)-2)
+    t = pos-k
+    table.append(tuple(int(round(a+(b-a)*t)) for (a, b) in zip(anchors[k], anchors[k+1])))
+  return table
+
+def densityPixels(counts, width, height, colormap='viridis', logscale=False):
+  "RGBA-rows of the histogram for a PNG (filter byte 0 in front of every row), empty bins are transparent."
+  
+  table = colormapTable(colormap)
+  if np is not None:
+    counts = np.asarray(counts)
+    cmax = int(counts.max()) if counts.size else 0
+    if cmax == 0:
+      level = np.zeros(counts.shape, dtype=np.intp)
+    elif logscale:
+      level = (np.log1p(counts)/math.log1p(cmax)*255).astype(np.intp)
+    else:
+      level = (counts*255//cmax).astype(np.intp)
+    lut = np.array([color+(255,) for color in table], dtype=np.uint8)
+    rgba = lut[level]
+    rgba[counts == 0] = 0
+    rows = np.zeros((height, width*4+1), dtype=np.uint8)
+    rows[:, 1:] = rgba.reshape(height, width*4)
+    return rows.tobytes()
+  
+  cmax = max(counts) if counts else 0
+  pixels = bytearray()
+  for row in range(height):
+    pixels.append(0)
+    for c in counts[row*width:(row+1)*width]:
+      if c == 0:
+        pixels.extend(b'\0\0\0\0')
+        continue
+      level = int(math.log1p(c)/math.log1p(cmax)*255) if logscale else c*255//cmax
+      pixels.extend(table[level])
+      pixels.append(255)
+  return bytes(pixels)
+
+def encodePNG(width, height, rows):
+  "A RGBA-PNG from the filtered rows, pure Python with zlib."
+  
+  def chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind+data) & 0xffffffff)
+  header = struct.pack('>IIBBBBB', width, height, 8, 6, 0, 0, 0)
+  return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(rows, 6)) + chunk(b'IEND', b'')
+
+class XYValues:
+  "Columnar storage of the xy-data: one x-column and one column for every y-column."
+  
+  def __init__(self, numberOfYColumns=1 ):
+    self.nYCols = numberOfYColumns
+    self.x = array('d')
+    self.y = [array('d') for i in range(numberOfYColumns)]
+    self.xmin = None
+    self.xmax = None
+    self.ymin = [None for i in range(numberOfYColumns)]
+    self.ymax = [None for i in range(numberOfYColumns)]
+    self.xrange = None
+    self.yranges = None
+    self.indexes = {}    # RangeIndex of the y-columns, built for the cache
+    self.xslice = None   # ((lo, hi), x[lo:hi]) shared by the series of a window
+
+  @classmethod
+  def fromColumns(cls, x, ycols):
+    "Uses the given columns as they are, e.g. arrays read from the cache."
+
+    data = cls(len(ycols))
+    data.x = x
+    data.y = list(ycols)
+    return data
+
+  def __iter__(self):
+    "Row-wise iteration, every row is a dict {'x': x, 'y': [y0, y1, ...]}."
+    
+    ycols = [col.tolist() for col in self.y]
+    for x, yrow in zip(self.x.tolist(), zip(*ycols)):
+      yield {'x': x, 'y': list(yrow)}
+  
+  def extend(self, x, ycols):
+    "Appends whole columns, x and every y-column must have the same length."
+    
+    self._growable()
+    self.x.extend(x)
+    for col, ycol in zip(self.y, ycols):
+      col.extend(ycol)
+  
+  def append(self, x, yarr):
+    self._growable()
+    self.x.append(x)
+    for col, y in zip(self.y, yarr):
+      col.append(y)
+  
+  def len(self):
+    return len(self.x)
+  
+  def sort(self):
+    """Sorts all columns by x with one stable permutation. Already sorted columns are left as they
+    are, memory-mapped columns are not copied."""
+    
+    if np is not None:
+      # views of the buffers, sorted columns stay without copy
+      self.x = np.asarray(self.x)
+      self.y = [np.asarray(col) for col in self.y]
+    if self.isSorted():
+      return
+    self.indexes = {}
+    self.xslice = None
+    if np is not None:
+      perm = np.argsort(self.x, kind='stable')
+      self.x = self.x[perm]
+      self.y = [col[perm] for col in self.y]
+    else:
+      perm = sorted(range(self.len()), key=self.x.__getitem__)
+      self.x = array('d', map(self.x.__getitem__, perm))
+      self.y = [array('d', map(col.__getitem__, perm)) for col in self.y]
+  
+  def isSorted(self):
+    x = self.x
+    if len(x) < 2:
+      return True
+    if np is not None:
+      x = np.asarray(x)
+      return bool(np.all(x[1:] >= x[:-1]))
+    return all(map(float.__le__, itertools.islice(x, 0, len(x)-1), itertools.islice(x, 1, None)))
+  
+  def getSeries(self, yidx, window=None):
+    """Returns the x-column and the y-column with index yidx. With window (xmin, xmax) of the sorted
+    data only the rows in between and one neighbour on each side, the clipping at the border stays
+    the same."""
+    
+    if window is None:
+      return (self.x, self.y[yidx])
+    rows = self.plotRows(*window)
+    if self.xslice is None or self.xslice[0] != rows:
+      self.xslice = (rows, self.x[rows[0]:rows[1]])
+    return (self.xslice[1], self.y[yidx][rows[0]:rows[1]])
+  
+  def window(self, xmin, xmax):
+    "Rows lo:hi of the sorted data with xmin <= x <= xmax, by binary search."
+    
+    if np is not None:
+      x = np.asarray(self.x)
+      return (int(np.searchsorted(x, xmin, side='left')), int(np.searchsorted(x, xmax, side='right')))
+    return (bisect_left(self.x, xmin), bisect_right(self.x, xmax))
+  
+  def plotRows(self, xmin, xmax):
+    "The rows of window with one neighbour on each side."
+    
+    (lo, hi) = self.window(xmin, xmax)
+    return (max(lo-1, 0), min(hi+1, self.len()))
+  
+  def rangeIndex(self, yidx):
+    if yidx not in self.indexes:
+      self.indexes[yidx] = RangeIndex(self.y[yidx])
+    return self.indexes[yidx]
+  
+  def toDict(self):
+    return {'x': list(map(float, self.x)), 'y': [list(map(float, col)) for col in self.y]}
+  
+  def getXMin(self):
+    return self.xmin
+  
+  def getXMax(self):
+    return self.xmax
+  
+  def getYMin(self):
+    return min(self.ymin)
+  
+  def getYMax(self):
+    return max(self.ymax)
+  
+  def calculateMinMax(self, window=None):
+    """With window (xmin, xmax) of the sorted data only the rows in between count (without rows
+    in between: the neighbours). x is taken from the first and the last row, y from the range
+    indexes if there are any (loaded from or built for the cache), otherwise only the rows of the
+    window are scanned: building an index reads the full column."""
+    
+    if window is None:
+      self.xrange = self._calculateMinMaxFromArray(self.x, round=False)
+      self.yranges = [self._calculateMinMaxFromArray(col, round=False) for col in self.y]
+    else:
+      (lo, hi) = self.window(*window)
+      if hi <= lo:
+        (lo, hi) = self.plotRows(*window)
+      self.xrange = (float(self.x[lo]), float(self.x[hi-1]))
+      self.yranges = [self.indexes[i].query(lo, hi) if i in self.indexes else _columnRange(self.y[i], lo, hi)
+                      for i in range(self.nYCols)]
+    (self.xmin,self.xmax) = roundRange(*self.xrange)
+    for i in range(self.nYCols):
+      (self.ymin[i],self.ymax[i]) = roundRange(*self.yranges[i])
+  
+  def _calculateMinMaxFromArray(self,array,round=True):
+    if np is not None:
+      vmin = float(np.min(array))
+      vmax = float(np.max(array))
+    else:
+      vmin = min(array)
+      vmax = max(array)
+    
+    if round:
+      (vmin, vmax) = roundRange(vmin, vmax)
+    return (vmin, vmax)
+  
+  def _growable(self):
+    "After sorting the columns may be numpy-arrays, appending needs array('d') again."
+    
+    self.indexes = {}
+    self.xslice = None
+    if not isinstance(self.x, array):
+      self.x = array('d', self.x)
+      self.y = [array('d', col) for col in self.y]
+
+class StreamRanges:
+  """Pass one of the streaming mode: the number of rows, the ranges and the order of x of a data
+  stream, collected block by block. It offers the part of the XYValues interface needed to set
+  up the axes. With positive the smallest and largest positive values are kept for log axes."""
+  
+  def __init__(self, numberOfYColumns=1, positive=False):
+    self.nYCols = numberOfYColumns
+    self.rows = 0
+    self.lastx = None
+    self.xrange = None
+    self.yranges = [None for i in range(numberOfYColumns)]
+    self.positive = [None for i in range(numberOfYColumns+1)] if positive else None
+    self.xmin = None
+    self.xmax = None
+    self.ymin = [None for i in range(numberOfYColumns)]
+    self.ymax = [None for i in range(numberOfYColumns)]
+  
+  def add(self, x, ycols):
+    "Adds a block, raises ValueError if the x-values are not sorted ascending."
+    
+    if not len(x):
+      return
+    i = _firstDescent(x, self.lastx)
+    if i is not None:
+      raise ValueError(_("The x-values are not sorted: data row {} is smaller than the row before. "
+                         "The streaming mode needs a file sorted by x.").format(self.rows+i+1))
+    block = XYValues.fromColumns(x, ycols)
+    block.calculateMinMax()
+    self.xrange = _unionRange(self.xrange, block.xrange)
+    self.yranges = [_unionRange(old, new) for (old, new) in zip(self.yranges, block.yranges)]
+    if self.positive is not None:
+      self.positive = [_unionRange(old, _positiveRange(col)) for (old, col) in zip(self.positive, [x]+list(ycols))]
+    self.rows += len(x)
+    self.lastx = float(x[-1])
+  
+  def len(self):
+    return self.rows
+  
+  def calculateMinMax(self, window=None):
+    "window is ignored, the streaming mode reads every row anyway."
+    
+    (self.xmin,self.xmax) = roundRange(*self.xrange)
+    for i in range(self.nYCols):
+      (self.ymin[i],self.ymax[i]) = roundRange(*self.yranges[i])
+  
+  def getSeries(self, yidx, window=None):
+    "Stand-ins for the columns x and y: their smallest and largest positive values, all that the scales need."
+    
+    if self.positive is None:
+      return (array('d'), array('d'))
+    return (array('d', self.positive[0] or ()), array('d', self.positive[yidx+1] or ()))
+  
+  def getXMin(self):
+    return self.xmin
+  
+  def getXMax(self):
+    return self.xmax
+  
+  def getYMin(self):
+    return min(self.ymin)
+  
+  def getYMax(self):
+    return max(self.ymax)
+
+def _firstDescent(x, previous=None):
+  "Index of the first value of x that is smaller than the one before it (previous: the one before x[0])."
+  
+  if previous is not None and x[0] < previous:
+    return 0
+  if np is not None:
+    x = np.asarray(x)
+    descents = np.flatnonzero(x[1:] < x[:-1])
+    return int(descents[0])+1 if descents.size else None
+  for i in range(1, len(x)):
+    if x[i] < x[i-1]:
+      return i
+  return None
+
+def _unionRange(a, b):
+  if a is None:
+    return b
+  if b is None:
+    return a
+  return (min(a[0], b[0]), max(a[1], b[1]))
+
+def _positiveRange(col):
+  if np is not None:
+    col = np.asarray(col)
+    col = col[col > 0]
+    return (float(col.min()), float(col.max())) if col.size else None
+  positive = [v for v in col if v > 0]
+  return (min(positive), max(positive)) if positive else None
+
+class RangeIndex:
+  """Minimum and maximum of every block of rows of a column. A query over the rows lo:hi scans only
+  the partial blocks at both ends and the extremes of the whole blocks in between. mins and maxs
+  can be given, e.g. from the cache."""
+  
+  def __init__(self, column, block=RANGE_BLOCK, mins=None, maxs=None):
+    self.column = column
+    self.block = block
+    if mins is None:
+      if np is not None:
+        values = np.asarray(column, dtype=float)
+        starts = np.arange(0, len(values), block)
+        mins = np.minimum.reduceat(values, starts) if len(values) else values
+        maxs = np.maximum.reduceat(values, starts) if len(values) else values
+      else:
+        mins = array('d', (min(column[i:i+block]) for i in range(0, len(column), block)))
+        maxs = array('d', (max(column[i:i+block]) for i in range(0, len(column), block)))
+    self.mins = mins
+    self.maxs = maxs
+  
+  def query(self, lo, hi):
+    "(min, max) of the rows lo:hi or None if there are none."
+    
+    if hi <= lo:
+      return None
+    first = -(-lo // self.block) # the whole blocks
+    last = hi // self.block
+    if first >= last:
+      return _columnRange(self.column, lo, hi)
+    ranges = [_columnRange(self.column, lo, first*self.block),
+              _columnRange(self.column, last*self.block, hi),
+              _columnRange(self.mins, first, last), _columnRange(self.maxs, first, last)]
+    ranges = [r for r in ranges if r is not None]
+    return (min(r[0] for r in ranges), max(r[1] for r in ranges))
+
+def _columnRange(column, lo, hi):
+  if hi <= lo:
+    return None
+  if np is not None:
+    values = np.asarray(column[lo:hi])
+    return (float(values.min()), float(values.max()))
+  values = column[lo:hi]
+  return (min(values), max(values))
+
+class LinearScale:
+  "The data is plotted as it is."
+  
+  name = 'linear'
+  
+  def forward(self, v):
+    return v
+  
+  def inverse(self, s):
+    return s
+  
+  def valid(self, v):
+    return True
+  
+  def autoRange(self, rounded, columns):
+    "The autodetected axis range, rounded is the one of XYValues.calculateMinMax."
+    
+    return rounded
+
+class LogScale(LinearScale):
+  "Decimal logarithm, values <= 0 become NaN and are left out."
+  
+  name = 'log'
+  
+  def forward(self, v):
+    if isinstance(v, (int, float)):
+      return math.log10(v) if v > 0 else math.nan
+    if np is not None:
+      v = np.asarray(v, dtype=float)
+      with np.errstate(divide='ignore', invalid='ignore'):
+        return np.where(v > 0, np.log10(v), np.nan)
+    return [math.log10(e) if e > 0 else math.nan for e in v]
+  
+  def inverse(self, s):
+    return 10**s
+  
+  def valid(self, v):
+    return v > 0
+  
+  def autoRange(self, rounded, columns):
+    "Full decades around the positive values."
+    
+    if np is not None:
+      columns = [np.asarray(col) for col in columns]
+      positive = [col[col > 0] for col in columns]
+      positive = [col for col in positive if col.size]
+      if not positive:
+        return rounded
+      (vmin, vmax) = (min(float(col.min()) for col in positive), max(float(col.max()) for col in positive))
+    else:
+      positive = [v for col in columns for v in col if v > 0]
+      if not positive:
+        return rounded
+      (vmin, vmax) = (min(positive), max(positive))
+    (emin, emax) = (math.floor(math.log10(vmin)), math.ceil(math.log10(vmax)))
+    return (10.0**emin, 10.0**max(emax, emin+1))
+
+class SymlogScale(LinearScale):
+  "sign(v)*log10(1+|v|/linthresh): logarithmic for large values, linear around zero."
+  
+  name = 'symlog'
+  
+  def __init__(self, linthresh=1.0):
+    self.linthresh = linthresh
+  
+  def forward(self, v):
+    c = self.linthresh
+    if isinstance(v, (int, float)):
+      return math.copysign(math.log10(1+abs(v)/c), v)
+    if np is not None:
+      v = np.asarray(v, dtype=float)
+      return np.sign(v)*np.log10(1+np.abs(v)/c)
+    return [math.copysign(math.log10(1+abs(e)/c), e) for e in v]
+  
+  def inverse(self, s):
+    return math.copysign(self.linthresh*(10**abs(s)-1), s)
+
+def makeScale(name, linthresh=1.0):
+  if name == 'log':
+    return LogScale()
+  if name == 'symlog':
+    return SymlogScale(linthresh if linthresh > 0 else 1.0)
+  return LinearScale()
+
+def scaleSeries(x, y, xscale, yscale, sx=None):
+  """Scales a series with one call per column, points that are not defined on a log-axis are dropped.
+  sx is the x-column already scaled, e.g. shared by several series."""
+  
+  (x, y) = (xscale.forward(x) if sx is None else sx, yscale.forward(y))
+  if xscale.name != 'log' and yscale.name != 'log':
+    return (x, y)
+  if np is not None:
+    (x, y) = (np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+    keep = ~(np.isnan(x) | np.isnan(y))
+    return (x[keep], y[keep])
+  keep = [i for i in range(len(x)) if not (math.isnan(x[i]) or math.isnan(y[i]))]
+  return ([x[i] for i in keep], [y[i] for i in keep])
+
+class XYSources:
+  """Series from several files, every series has its own sorted x-column. Series i is the y-column
+  columns[i][1] of the XYValues sources[columns[i][0]]."""
+  
+  def __init__(self, sources, columns):
+    self.sources = sources
+    self.columns = columns
+    self.nYCols = len(columns)
+    self.xrange = None
+    self.yranges = None
+  
+  def len(self):
+    "The length of the shortest series."
+    
+    return min(self.sources[source].len() for (source, col) in self.columns)
+  
+  def getSeries(self, yidx, window=None):
+    (source, col) = self.columns[yidx]
+    return self.sources[source].getSeries(col, window)
+  
+  def calculateMinMax(self, window=None):
+    "Autoscaling over all sources, see XYValues.calculateMinMax."
+    
+    for source in self.sources:
+      source.calculateMinMax(window)
+    xranges = [self.sources[source].xrange for (source, col) in self.columns]
+    self.xrange = (min(r[0] for r in xranges), max(r[1] for r in xranges))
+    (self.xmin, self.xmax) = roundRange(*self.xrange)
+    self.yranges = [self.sources[source].yranges[col] for (source, col) in self.columns]
+    self.ymin = [self.sources[source].ymin[col] for (source, col) in self.columns]
+    self.ymax = [self.sources[source].ymax[col] for (source, col) in self.columns]
+  
+  def getXMin(self):
+    return self.xmin
+  
+  def getXMax(self):
+    return self.xmax
+  
+  def getYMin(self):
+    return min(self.ymin)
+  
+  def getYMax(self):
+    return max(self.ymax)
+  
+  def toDict(self):
+    series = []
+    for i in range(self.nYCols):
+      (x, y) = self.getSeries(i)
+      series.append({'x': list(map(float, x)), 'y': list(map(float, y))})
+    return {'series': series}
+
+def parseSeries(text):
+  """Parses the series option: entries file,xcolumn,ycolumn separated by | or line breaks.
+  Returns a list of (file, xidx, yidx)."""
+  
+  series = []
+  for entry in re.split(r'[|\n]', text):
+    if not entry.strip():
+      continue
+    try:
+      (csvfile, xidx, yidx) = entry.rsplit(',', 2)
+      series.append((csvfile.strip(), int(xidx), int(yidx)))
+    except ValueError:
+      raise ValueError(_("Series '{}' is not of the form file,xcolumn,ycolumn.".format(entry.strip())))
+  return series